@@ -0,0 +1,72 @@
+"""add folder path index
+
+Revision ID: 09d5a8cf6e01
+Revises: f518f089d25d
+Create Date: 2026-10-18 10:49:16.944670
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '09d5a8cf6e01'
+down_revision: Union[str, Sequence[str], None] = 'f518f089d25d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_PATHS = sa.text(
+    """
+    WITH RECURSIVE tree AS (
+        SELECT id, '/' || id || '/' AS path, 0 AS depth
+        FROM folders
+        WHERE parent_id IS NULL
+        UNION ALL
+        SELECT f.id, tree.path || f.id || '/', tree.depth + 1
+        FROM folders f
+        JOIN tree ON f.parent_id = tree.id
+    )
+    UPDATE folders SET path = tree.path, depth = tree.depth
+    FROM tree
+    WHERE folders.id = tree.id
+    """
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('folders', sa.Column('path', sa.Text(), nullable=True))
+    op.add_column('folders', sa.Column('depth', sa.Integer(), server_default='0', nullable=False))
+
+    bind = op.get_bind()
+    bind.execute(BACKFILL_PATHS)
+    # Folders caught in a parent_id cycle are unreachable from any root;
+    # detach one folder per cycle and backfill again until none are left.
+    while True:
+        orphan_id = bind.execute(
+            sa.text("SELECT min(id) FROM folders WHERE path IS NULL")
+        ).scalar()
+        if orphan_id is None:
+            break
+        bind.execute(
+            sa.text("UPDATE folders SET parent_id = NULL WHERE id = :id"),
+            {"id": orphan_id},
+        )
+        bind.execute(BACKFILL_PATHS)
+
+    op.alter_column('folders', 'path', nullable=False)
+    op.create_index('ix_folders_path', 'folders', ['path'], unique=False, postgresql_ops={'path': 'text_pattern_ops'})
+    op.create_index(op.f('ix_folders_parent_id'), 'folders', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_files_folder_id'), 'files', ['folder_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_files_folder_id'), table_name='files')
+    op.drop_index(op.f('ix_folders_parent_id'), table_name='folders')
+    op.drop_index('ix_folders_path', table_name='folders')
+    op.drop_column('folders', 'depth')
+    op.drop_column('folders', 'path')
@@ -0,0 +1,30 @@
+"""add name search indexes
+
+Revision ID: 4c9b6a36d1eb
+Revises: f5e53c87afd4
+Create Date: 2026-10-18 11:05:19.243208
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c9b6a36d1eb'
+down_revision: Union[str, Sequence[str], None] = 'f5e53c87afd4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_files_name_search', 'files', [sa.text("to_tsvector('simple'::regconfig, name)")], unique=False, postgresql_using='gin')
+    op.create_index('ix_folders_name_search', 'folders', [sa.text("to_tsvector('simple'::regconfig, name)")], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_folders_name_search', table_name='folders', postgresql_using='gin')
+    op.drop_index('ix_files_name_search', table_name='files', postgresql_using='gin')
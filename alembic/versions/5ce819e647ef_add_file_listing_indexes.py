@@ -0,0 +1,35 @@
+"""add file listing indexes
+
+Revision ID: 5ce819e647ef
+Revises: 09d5a8cf6e01
+Create Date: 2026-10-18 10:53:33.400668
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5ce819e647ef'
+down_revision: Union[str, Sequence[str], None] = '09d5a8cf6e01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_files_folder_id_name_id', 'files', ['folder_id', 'name', 'id'], unique=False)
+    op.create_index('ix_files_folder_id_created_at_id', 'files', ['folder_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_files_folder_id_updated_at_id', 'files', ['folder_id', 'updated_at', 'id'], unique=False)
+    # Covered by the composite indexes above
+    op.drop_index(op.f('ix_files_folder_id'), table_name='files')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_files_folder_id'), 'files', ['folder_id'], unique=False)
+    op.drop_index('ix_files_folder_id_updated_at_id', table_name='files')
+    op.drop_index('ix_files_folder_id_created_at_id', table_name='files')
+    op.drop_index('ix_files_folder_id_name_id', table_name='files')
@@ -0,0 +1,30 @@
+"""add job progress
+
+Revision ID: 91c867cbfff8
+Revises: 00cc184a2d12
+Create Date: 2026-10-18 11:17:00.272611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '91c867cbfff8'
+down_revision: Union[str, Sequence[str], None] = '00cc184a2d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('progress', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('jobs', sa.Column('total', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'total')
+    op.drop_column('jobs', 'progress')
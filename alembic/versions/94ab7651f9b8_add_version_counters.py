@@ -0,0 +1,36 @@
+"""add version counters
+
+Revision ID: 94ab7651f9b8
+Revises: 5ce819e647ef
+Create Date: 2026-10-18 10:54:49.932629
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '94ab7651f9b8'
+down_revision: Union[str, Sequence[str], None] = '5ce819e647ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('version_counters',
+    sa.Column('scope', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+    op.execute("INSERT INTO version_counters (scope) VALUES ('tree')")
+    op.add_column('folders', sa.Column('version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('folders', 'version')
+    op.drop_table('version_counters')
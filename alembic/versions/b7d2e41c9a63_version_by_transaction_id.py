@@ -0,0 +1,38 @@
+"""version by transaction id
+
+Revision ID: b7d2e41c9a63
+Revises: f9e4bb974059
+Create Date: 2026-10-18 14:02:37.518206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e41c9a63'
+down_revision: Union[str, Sequence[str], None] = 'f9e4bb974059'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Versions become transaction ids, which don't continue the old counter.
+    # Clients resuming from an old version get a reset.
+    op.execute("DELETE FROM change_log")
+    op.execute(
+        "UPDATE version_counters SET value = pg_current_xact_id()::text::bigint, "
+        "updated_at = now() WHERE scope = 'tree'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM change_log")
+    op.execute(
+        "UPDATE version_counters SET value = value + 1, updated_at = now() "
+        "WHERE scope = 'tree'"
+    )
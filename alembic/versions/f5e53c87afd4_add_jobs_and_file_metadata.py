@@ -0,0 +1,63 @@
+"""add jobs and file metadata
+
+Revision ID: f5e53c87afd4
+Revises: 94ab7651f9b8
+Create Date: 2026-10-18 11:01:43.280690
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5e53c87afd4'
+down_revision: Union[str, Sequence[str], None] = '94ab7651f9b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('files', sa.Column('page_count', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('has_thumbnail', sa.Boolean(), server_default='false', nullable=False))
+    op.add_column('files', sa.Column('text_content', sa.Text(), nullable=True))
+    op.add_column('files', sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('max_attempts', sa.Integer(), server_default='3', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_file_id'), 'jobs', ['file_id'], unique=False)
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+    # Files uploaded before this migration get processed too
+    op.execute(
+        "INSERT INTO jobs (kind, file_id) "
+        "SELECT 'process_pdf', id FROM files WHERE content_hash IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_file_id'), table_name='jobs')
+    op.drop_table('jobs')
+    op.drop_column('files', 'processed_at')
+    op.drop_column('files', 'text_content')
+    op.drop_column('files', 'has_thumbnail')
+    op.drop_column('files', 'page_count')
@@ -0,0 +1,47 @@
+"""add folder stats
+
+Revision ID: f9e4bb974059
+Revises: 91c867cbfff8
+Create Date: 2026-10-18 11:32:21.712829
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9e4bb974059'
+down_revision: Union[str, Sequence[str], None] = '91c867cbfff8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('files', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('folders', sa.Column('file_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('folders', sa.Column('subfolder_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('folders', sa.Column('total_file_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('folders', sa.Column('total_folder_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('folders', sa.Column('total_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    # Existing folders get their stats, and existing files their sizes, from
+    # a repair job over every tree
+    op.execute(
+        "INSERT INTO jobs (kind, payload, total) "
+        "SELECT 'repair_folder_stats', "
+        "jsonb_build_object('root_ids', coalesce(jsonb_agg(id ORDER BY id), '[]')), "
+        "count(*) FROM folders WHERE parent_id IS NULL HAVING count(*) > 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM jobs WHERE kind = 'repair_folder_stats'")
+    op.drop_column('folders', 'total_bytes')
+    op.drop_column('folders', 'total_folder_count')
+    op.drop_column('folders', 'total_file_count')
+    op.drop_column('folders', 'subfolder_count')
+    op.drop_column('folders', 'file_count')
+    op.drop_column('files', 'size_bytes')
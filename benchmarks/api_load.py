@@ -0,0 +1,429 @@
+"""Load benchmark of the folder/file API.
+
+Builds a synthetic data room (``--depth`` levels of ``--fan-out`` folders,
+``--files`` files in each) in the configured database, then drives the real
+app in-process through ``httpx.AsyncClient`` and the ASGI transport, with
+``--concurrency`` requests in flight. Every scenario reports p50/p95/p99
+latency, throughput and peak memory; ``--output`` writes them as JSON for
+``benchmarks.compare``. The data room is deleted afterwards unless ``--keep``
+is given.
+
+Needs PostgreSQL: the services rely on advisory locks, data-modifying CTEs,
+JSONB and full text search, so there is no SQLite stand-in. Point
+DATABASE_URL at a scratch database migrated to head.
+
+    python -m benchmarks.api_load --depth 4 --fan-out 5 --files 10 \\
+        --requests 500 --concurrency 8 --output before.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+from sqlalchemy import func, insert, select
+
+from src.core.database import AsyncSessionLocal, engine
+from src.main import app
+from src.models.file import File
+from src.models.folder import Folder
+from src.services.bulk import CREATED
+from src.services.changes import FOLDER, change
+from src.services.cleanup import release_blobs
+from src.services.folder import FolderService
+from src.services.folder_stats import FolderStatsService
+from src.services.job import JobService
+from src.services.tree_cache import tree_cache
+from src.services.version import VersionService
+
+INSERT_BATCH = 1000
+SCENARIOS = (
+    "tree",
+    "tree_cached",
+    "list_files",
+    "upload",
+    "move_folder",
+    "move_file",
+    "delete_folder",
+)
+
+
+@dataclass
+class DataRoom:
+    root_id: int
+    internal_ids: List[int]
+    leaf_ids: List[int]
+    file_ids: List[int]
+    listing_id: int
+    folder_count: int
+    file_count: int
+    deletable: List[int]
+    cursor: Optional[str] = None
+
+
+async def build_data_room(
+    depth: int, fan_out: int, files: int, listing_files: int
+) -> DataRoom:
+    """Insert the folders and files directly, in multi-row batches."""
+    levels = [fan_out**level for level in range(depth + 1)]
+    folder_count = sum(levels) + 1  # plus the listing folder
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                func.nextval(func.pg_get_serial_sequence("folders", "id"))
+            ).select_from(func.generate_series(1, folder_count))
+        )
+        ids = iter(result.scalars().all())
+
+        run = uuid.uuid4().hex[:8]
+        root_id = next(ids)
+        folders = [
+            {
+                "id": root_id,
+                "name": f"bench-{run}",
+                "parent_id": None,
+                "path": f"/{root_id}/",
+                "depth": 0,
+            }
+        ]
+        parents = [folders[0]]
+        for level in range(1, depth + 1):
+            children = []
+            for parent in parents:
+                for index in range(fan_out):
+                    folder_id = next(ids)
+                    children.append(
+                        {
+                            "id": folder_id,
+                            "name": f"Folder {level}.{index}",
+                            "parent_id": parent["id"],
+                            "path": f"{parent['path']}{folder_id}/",
+                            "depth": level,
+                        }
+                    )
+            folders.extend(children)
+            parents = children
+        listing_id = next(ids)
+        folders.append(
+            {
+                "id": listing_id,
+                "name": "Listing",
+                "parent_id": root_id,
+                "path": f"/{root_id}/{listing_id}/",
+                "depth": 1,
+            }
+        )
+
+        file_rows = [
+            {"name": f"Document {index}", "extension": "pdf", "folder_id": f["id"]}
+            for f in folders[:-1]
+            for index in range(files)
+        ]
+        file_rows += [
+            {"name": f"Report {index:06d}", "extension": "pdf", "folder_id": listing_id}
+            for index in range(listing_files)
+        ]
+        for start in range(0, len(folders), INSERT_BATCH):
+            await db.execute(insert(Folder), folders[start : start + INSERT_BATCH])
+        file_ids = []
+        for start in range(0, len(file_rows), INSERT_BATCH):
+            result = await db.execute(
+                insert(File).returning(File.id),
+                file_rows[start : start + INSERT_BATCH],
+            )
+            file_ids.extend(result.scalars().all())
+        await FolderStatsService.repair_tree(db, root_id)
+        await VersionService.bump(db, changes=[change(FOLDER, CREATED, root_id)])
+        await db.commit()
+    tree_cache.clear()
+
+    leaf_ids = [f["id"] for f in folders[:-1] if f["depth"] == depth]
+    internal_ids = [f["id"] for f in folders[:-1] if f["depth"] < depth]
+    return DataRoom(
+        root_id=root_id,
+        internal_ids=internal_ids,
+        leaf_ids=leaf_ids,
+        file_ids=file_ids,
+        listing_id=listing_id,
+        folder_count=folder_count,
+        file_count=len(file_rows),
+        deletable=random.Random(len(leaf_ids)).sample(leaf_ids, len(leaf_ids)),
+    )
+
+
+async def drop_data_room(room: DataRoom) -> None:
+    async with AsyncSessionLocal() as db:
+        _, job_id = await FolderService.delete_folder(db, room.root_id)
+        if job_id is not None:
+            # Uploaded blobs; the job worker isn't running in this process
+            job = await JobService.get(db, job_id)
+            await release_blobs(db, job)
+            await JobService.complete(db, job_id)
+            await db.commit()
+
+
+def make_pdf(seed: int) -> bytes:
+    """A small valid one-page PDF, unique per ``seed`` so nothing dedupes."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>",
+    ]
+    out = b"%PDF-1.4\n% bench " + str(seed).encode() + b"\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return out
+
+
+Request = Callable[[httpx.AsyncClient, DataRoom, random.Random, int], Awaitable]
+
+
+async def tree(client, room, rng, n):
+    tree_cache.clear()
+    return await client.get(f"/api/v1/folders/{room.root_id}/tree")
+
+
+async def tree_cached(client, room, rng, n):
+    return await client.get(f"/api/v1/folders/{room.root_id}/tree")
+
+
+async def list_files(client, room, rng, n):
+    # Walks the big folder page by page, starting over at the end
+    params = {"limit": 100}
+    if room.cursor:
+        params["cursor"] = room.cursor
+    response = await client.get(
+        f"/api/v1/files/folder/{room.listing_id}", params=params
+    )
+    if response.status_code == 200:
+        room.cursor = response.json()["next_cursor"]
+    return response
+
+
+async def upload(client, room, rng, n):
+    return await client.post(
+        "/api/v1/files/upload/",
+        data={"folder_id": str(rng.choice(room.leaf_ids))},
+        files={"uploaded_file": (f"upload-{n}.pdf", make_pdf(n), "application/pdf")},
+    )
+
+
+async def move_folder(client, room, rng, n):
+    # Leaves only ever go under internal folders, so no move is circular
+    return await client.post(
+        f"/api/v1/folders/{rng.choice(room.leaf_ids)}/move",
+        json={"parent_id": rng.choice(room.internal_ids)},
+    )
+
+
+async def move_file(client, room, rng, n):
+    return await client.put(
+        f"/api/v1/files/{rng.choice(room.file_ids)}",
+        json={"folder_id": rng.choice(room.leaf_ids)},
+    )
+
+
+async def delete_folder(client, room, rng, n):
+    return await client.delete(f"/api/v1/folders/{room.deletable.pop()}")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    room: DataRoom,
+    request: Request,
+    requests: int,
+    concurrency: int,
+    seed: int,
+    trace_memory: bool,
+) -> dict:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < requests:
+            n = issued
+            issued += 1
+            started = time.perf_counter()
+            response = await request(client, room, rng, n)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    alloc_peak = None
+    if trace_memory:
+        alloc_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(ms, 0.50),
+        "p95_ms": percentile(ms, 0.95),
+        "p99_ms": percentile(ms, 0.99),
+        "mean_ms": statistics.fmean(ms) if ms else 0.0,
+        "max_ms": ms[-1] if ms else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (2**20 if sys.platform == "darwin" else 2**10),
+        "alloc_peak_mb": alloc_peak,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> dict:
+    room = await build_data_room(
+        args.depth, args.fan_out, args.files, args.listing_files
+    )
+    print(
+        f"data room {room.root_id}: {room.folder_count} folders, "
+        f"{room.file_count} files",
+        file=sys.stderr,
+    )
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            for name in args.scenarios:
+                requests, warmup = args.requests, args.warmup
+                if name == "delete_folder":
+                    # Each leaf can only be deleted once
+                    warmup = min(warmup, len(room.deletable) // 4)
+                    requests = min(requests, len(room.deletable) - warmup)
+                # Warm up connections, caches and code paths first
+                await run_scenario(
+                    client, room, globals()[name], warmup, 1, args.seed, False
+                )
+                results[name] = await run_scenario(
+                    client,
+                    room,
+                    globals()[name],
+                    requests,
+                    args.concurrency,
+                    args.seed,
+                    args.trace_memory,
+                )
+                summary = results[name]
+                print(
+                    f"{name:<14} p50 {summary['p50_ms']:8.2f} ms  "
+                    f"p95 {summary['p95_ms']:8.2f} ms  "
+                    f"p99 {summary['p99_ms']:8.2f} ms  "
+                    f"{summary['throughput_rps']:8.1f} req/s  "
+                    f"errors {summary['errors']}",
+                    file=sys.stderr,
+                )
+    finally:
+        if not args.keep:
+            await drop_data_room(room)
+        await engine.dispose()
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "folders": room.folder_count,
+            "files": room.file_count,
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fan-out", type=int, default=5)
+    parser.add_argument("--files", type=int, default=10, help="files per folder")
+    parser.add_argument(
+        "--listing-files",
+        type=int,
+        default=5000,
+        help="files in the folder paged through by list_files",
+    )
+    parser.add_argument("--requests", type=int, default=300, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--scenario",
+        dest="scenarios",
+        action="append",
+        choices=SCENARIOS,
+        help="run only these (repeatable); default all",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also report the Python allocation peak (slows requests down)",
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the data room")
+    parser.add_argument("--output", help="write the results as JSON here")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = asyncio.run(main(arguments))
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
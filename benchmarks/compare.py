@@ -0,0 +1,74 @@
+"""Compare two ``benchmarks.api_load`` result files.
+
+Prints the change of every latency percentile and of throughput per
+scenario, and exits with status 1 when any of them got worse by more than
+``--threshold`` (a fraction) or a scenario started failing requests.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+# Metric, and whether a higher value is better
+METRICS = (
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("throughput_rps", True),
+)
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """Print the comparison table and return the regressions found."""
+    regressions = []
+    print(f"{'scenario':<14} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}")
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric} {change:+.1%}")
+            print(
+                f"{name:<14} {metric:<15} {old[metric]:>10.2f} "
+                f"{new[metric]:>10.2f} {change:>+8.1%}{flag}"
+            )
+        if new["errors"] > old["errors"]:
+            regressions.append(f"{name} errors {old['errors']} -> {new['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(args.before) as before, open(args.after) as after:
+        before, after = json.load(before), json.load(after)
+    for label, report in (("before", before), ("after", after)):
+        meta = report["meta"]
+        print(
+            f"{label}: {meta['revision']} at {meta['created_at']}, "
+            f"{meta['folders']} folders, {meta['files']} files"
+        )
+    if before["meta"]["params"] != after["meta"]["params"]:
+        print("warning: the runs used different parameters", file=sys.stderr)
+
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
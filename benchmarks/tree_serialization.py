@@ -0,0 +1,115 @@
+"""Per-node cost of serializing a folder tree response.
+
+Compares FastAPI's ``response_model`` path (validate the assembled dicts
+against ``List[FolderTree]``, dump them, then ``json.dumps`` in
+``JSONResponse``) with the encoder the tree endpoints use now. Tree cache
+hits skip even that, since snapshots keep the encoded body.
+
+    python -m benchmarks.tree_serialization --nodes 100000
+"""
+
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.core.responses import encode_json
+from src.schemas.folder import FolderTree
+
+FILES_PER_FOLDER = 3
+FAN_OUT = 8
+
+
+def build_tree(nodes: int) -> List[dict]:
+    """A tree shaped like ``_assemble_tree`` output, breadth first, with
+    ``nodes`` folders and files in total."""
+    now = datetime.now(timezone.utc)
+    ids = itertools.count(1)
+    remaining = nodes
+
+    def new_folder(parent_id):
+        nonlocal remaining
+        node = {
+            "id": next(ids),
+            "name": "Folder",
+            "parent_id": parent_id,
+            "created_at": now,
+            "updated_at": now,
+            "files": [],
+            "subfolders": [],
+        }
+        remaining -= 1
+        while remaining > 0 and len(node["files"]) < FILES_PER_FOLDER:
+            file_id = next(ids)
+            node["files"].append(
+                {
+                    "id": file_id,
+                    "name": f"Document {file_id}",
+                    "extension": "pdf",
+                    "created_at": now,
+                }
+            )
+            remaining -= 1
+        return node
+
+    roots = [new_folder(None)]
+    queue = deque(roots)
+    while remaining > 0:
+        parent = queue.popleft()
+        for _ in range(FAN_OUT):
+            if remaining <= 0:
+                break
+            child = new_folder(parent["id"])
+            parent["subfolders"].append(child)
+            queue.append(child)
+    return roots
+
+
+def response_model_path(tree: List[dict]) -> bytes:
+    field = create_response_field(name="Response", type_=List[FolderTree])
+    content = asyncio.run(serialize_response(field=field, response_content=tree))
+    return JSONResponse(content).body
+
+
+def fast_path(tree: List[dict]) -> bytes:
+    return encode_json(tree)
+
+
+def measure(fn, tree, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(tree)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tree = build_tree(args.nodes)
+    body = fast_path(tree)
+    assert body == response_model_path(tree), "fast path output differs"
+
+    before = measure(response_model_path, tree, args.repeat)
+    after = measure(fast_path, tree, args.repeat)
+    print(f"{args.nodes} nodes, {len(body) / 1e6:.1f} MB, median of {args.repeat}")
+    for label, seconds in (("response_model", before), ("encode_json", after)):
+        per_node = seconds / args.nodes * 1e6
+        print(f"  {label:<15} {seconds * 1000:9.1f} ms  {per_node:7.2f} us/node")
+    print(f"  speedup         {before / after:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
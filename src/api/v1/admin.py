@@ -0,0 +1,71 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.database import get_db, pool_metrics
+from src.core.config import settings
+from src.core.profiler import profile_store, token_matches
+from src.services.folder_stats import FolderStatsService
+from src.services.job import JobService
+from src.services.tree_cache import tree_cache
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/tree-cache", response_model=dict)
+async def tree_cache_stats():
+    return tree_cache.stats()
+
+
+@router.get("/db-pool", response_model=dict)
+async def db_pool_stats():
+    return pool_metrics()
+
+
+@router.get("/jobs", response_model=dict)
+async def job_stats(db: AsyncSession = Depends(get_db)):
+    return await JobService.stats(db)
+
+
+@router.post("/folder-stats/repair", response_model=dict)
+async def repair_folder_stats(db: AsyncSession = Depends(get_db)):
+    return {"job_id": await FolderStatsService.schedule_repair(db)}
+
+
+def require_profile_token(
+    x_profile_token: Optional[str] = Header(None),
+) -> None:
+    if not settings.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(x_profile_token, settings.PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@router.get(
+    "/profiles",
+    response_model=List[dict],
+    dependencies=[Depends(require_profile_token)],
+)
+async def list_profiles():
+    return profile_store.list()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_model=dict,
+    dependencies=[Depends(require_profile_token)],
+)
+async def get_profile(profile_id: int):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.as_dict()
+
+
+@router.delete(
+    "/profiles", response_model=dict, dependencies=[Depends(require_profile_token)]
+)
+async def clear_profiles():
+    profile_store.clear()
+    return {"cleared": True}
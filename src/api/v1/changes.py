@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from src.core.database import get_db
+from src.schemas.change import ChangePage
+from src.services.changes import ChangeService, change_feed
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+
+@router.get("/", response_model=ChangePage)
+async def list_changes(
+    since: int = Query(..., ge=0, description="Tree version the client has"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+):
+    return await ChangeService.list_since(db, since, limit)
+
+
+@router.get("/stream")
+async def stream_changes(
+    since: Optional[int] = Query(
+        None, ge=0, description="Tree version the client has; defaults to now"
+    ),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events: one ``change`` event per tree version.
+
+    Browsers reconnect with ``Last-Event-ID`` and resume where they left off.
+    """
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+        since = int(last_event_id)
+    return StreamingResponse(
+        change_feed.events(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,43 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
+import mimetypes
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Literal, Optional
 
-from src.schemas.file import FileCreate, FileUpdate, FileResponse
+from src.schemas.bulk import BulkIds, BulkRename, BulkResult
+from src.schemas.file import (
+    FileBulkMove,
+    FileCreate,
+    FilePage,
+    FileResponse,
+    FileUpdate,
+    file_page_adapter,
+)
 from src.core.database import get_db
+from src.core.http import (
+    cache_headers,
+    if_range_matches,
+    is_not_modified,
+    not_modified,
+    parse_range,
+)
+from src.core.responses import (
+    IMMUTABLE_CACHE_CONTROL,
+    BlobResponse,
+    content_disposition,
+    json_response,
+)
 from src.services.file import FileService
+from src.services.version import VersionService
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
@@ -23,6 +56,24 @@ async def upload_file(
     return await FileService.upload_file(db, folder_id, uploaded_file)
 
 
+@router.post("/bulk/move", response_model=BulkResult)
+async def bulk_move_files(data: FileBulkMove, db: AsyncSession = Depends(get_db)):
+    results = await FileService.bulk_move(db, data.ids, data.folder_id)
+    return {"results": results}
+
+
+@router.post("/bulk/rename", response_model=BulkResult)
+async def bulk_rename_files(data: BulkRename, db: AsyncSession = Depends(get_db)):
+    results = await FileService.bulk_rename(db, data.model_dump()["items"])
+    return {"results": results}
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def bulk_delete_files(data: BulkIds, db: AsyncSession = Depends(get_db)):
+    results, job_id = await FileService.bulk_delete(db, data.ids)
+    return {"results": results, "cleanup_job_id": job_id}
+
+
 @router.get("/{file_id}", response_model=FileResponse)
 async def get_file(file_id: int, db: AsyncSession = Depends(get_db)):
     file = await FileService.get_file(db, file_id)
@@ -31,6 +82,50 @@ async def get_file(file_id: int, db: AsyncSession = Depends(get_db)):
     return file
 
 
+@router.get("/{file_id}/content", response_class=BlobResponse)
+async def download_file(
+    file_id: int,
+    request: Request,
+    download: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    file, path, size = await FileService.get_file_content(db, file_id)
+    await db.close()  # release the connection before streaming
+
+    etag = f'"{file.content_hash}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control=IMMUTABLE_CACHE_CONTROL)
+
+    byte_range = None
+    if if_range_matches(request, etag):
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    filename = f"{file.name}.{file.extension}"
+    headers = cache_headers(etag, cache_control=IMMUTABLE_CACHE_CONTROL)
+    headers["Content-Disposition"] = content_disposition(filename, download)
+    return BlobResponse(
+        path,
+        size,
+        byte_range=byte_range,
+        headers=headers,
+        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    )
+
+
+@router.get("/{file_id}/thumbnail", response_class=BlobResponse)
+async def get_file_thumbnail(
+    file_id: int, request: Request, db: AsyncSession = Depends(get_db)
+):
+    file, path, size = await FileService.get_file_thumbnail(db, file_id)
+    await db.close()
+
+    etag = f'"thumb-{file.content_hash}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control=IMMUTABLE_CACHE_CONTROL)
+    headers = cache_headers(etag, cache_control=IMMUTABLE_CACHE_CONTROL)
+    return BlobResponse(path, size, headers=headers, media_type="image/png")
+
+
 @router.put("/{file_id}", response_model=FileResponse)
 async def update_file(
     file_id: int, data: FileUpdate, db: AsyncSession = Depends(get_db)
@@ -49,6 +144,35 @@ async def delete_file(file_id: int, db: AsyncSession = Depends(get_db)):
     return {"deleted": success}
 
 
-@router.get("/folder/{folder_id}", response_model=List[FileResponse])
-async def get_files_in_folder(folder_id: int, db: AsyncSession = Depends(get_db)):
-    return await FileService.get_files_in_folder(db, folder_id)
+@router.get("/folder/{folder_id}", response_model=FilePage)
+async def get_files_in_folder(
+    folder_id: int,
+    request: Request,
+    sort: Literal["name", "created_at", "updated_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = Query(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+):
+    headers = {}
+    version = await VersionService.folder_version(db, folder_id)
+    if version is not None:
+        etag = f'"folder-{folder_id}-{version}"'
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        headers = cache_headers(etag)
+
+    files, next_cursor = await FileService.get_files_in_folder(
+        db,
+        folder_id,
+        sort=sort,
+        order=order,
+        limit=limit,
+        cursor=cursor,
+        prefix=prefix,
+    )
+    page = file_page_adapter.validate_python(
+        {"items": files, "next_cursor": next_cursor}, from_attributes=True
+    )
+    return json_response(file_page_adapter.dump_json(page), headers)
@@ -1,19 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from src.schemas.folder import FolderCreate, FolderUpdate, FolderResponse, FolderTree
+from src.schemas.bulk import BulkIds, BulkRename, BulkResult
+from src.schemas.folder import (
+    DescendantCount,
+    FolderBulkMove,
+    FolderChildren,
+    FolderCreate,
+    FolderCrumb,
+    FolderMove,
+    FolderMoveResponse,
+    FolderNode,
+    FolderResponse,
+    FolderTree,
+    FolderUpdate,
+)
 from src.core.database import get_db
+from src.core.http import cache_headers, is_not_modified, not_modified
+from src.core.responses import content_disposition, json_response
+from src.services.archive import ArchiveService
 from src.services.folder import FolderService
+from src.services.tree_cache import TreeKey, tree_cache
+from src.services.version import VersionService
 
 router = APIRouter(prefix="/folders", tags=["Folders"])
 
+MAX_EXPAND_IDS = 100
+
 
 @router.post("/", response_model=FolderResponse)
 async def create_folder(folder: FolderCreate, db: AsyncSession = Depends(get_db)):
     return await FolderService.create_folder(db, folder)
 
 
+@router.post("/bulk/move", response_model=BulkResult)
+async def bulk_move_folders(data: FolderBulkMove, db: AsyncSession = Depends(get_db)):
+    results = await FolderService.bulk_move(db, data.ids, data.parent_id)
+    return {"results": results}
+
+
+@router.post("/bulk/rename", response_model=BulkResult)
+async def bulk_rename_folders(data: BulkRename, db: AsyncSession = Depends(get_db)):
+    results = await FolderService.bulk_rename(db, data.model_dump()["items"])
+    return {"results": results}
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def bulk_delete_folders(data: BulkIds, db: AsyncSession = Depends(get_db)):
+    results, job_id = await FolderService.bulk_delete(db, data.ids)
+    return {"results": results, "cleanup_job_id": job_id}
+
+
+@router.get("/roots/", response_model=List[FolderNode])
+async def list_root_folders(
+    request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    not_modified_response = await _check_tree_version(request, response, db)
+    if not_modified_response is not None:
+        return not_modified_response
+    return await FolderService.get_root_nodes(db)
+
+
+@router.get("/expand/", response_model=List[FolderChildren])
+async def expand_folders(
+    request: Request,
+    response: Response,
+    ids: List[int] = Query(..., min_length=1, max_length=MAX_EXPAND_IDS),
+    include_files: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    not_modified_response = await _check_tree_version(request, response, db)
+    if not_modified_response is not None:
+        return not_modified_response
+    return await FolderService.get_children(db, ids, include_files=include_files)
+
+
 @router.get("/{folder_id}", response_model=FolderResponse)
 async def get_folder(folder_id: int, db: AsyncSession = Depends(get_db)):
     folder = await FolderService.get_folder(db, folder_id)
@@ -22,9 +85,78 @@ async def get_folder(folder_id: int, db: AsyncSession = Depends(get_db)):
     return folder
 
 
+@router.get("/{folder_id}/tree", response_model=FolderTree)
+async def get_folder_subtree(
+    folder_id: int,
+    request: Request,
+    max_depth: Optional[int] = Query(None, ge=0),
+    include_files: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    key = TreeKey(folder_id, max_depth, include_files)
+    return await _tree_response(request, db, key)
+
+
+@router.get("/{folder_id}/children", response_model=FolderChildren)
+async def get_folder_children(
+    folder_id: int,
+    request: Request,
+    response: Response,
+    include_files: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    not_modified_response = await _check_tree_version(request, response, db)
+    if not_modified_response is not None:
+        return not_modified_response
+    levels = await FolderService.get_children(
+        db, [folder_id], include_files=include_files
+    )
+    if not levels:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return levels[0]
+
+
+@router.get("/{folder_id}/archive", response_class=StreamingResponse)
+async def download_folder_archive(folder_id: int, db: AsyncSession = Depends(get_db)):
+    """The folder and everything below it as a zip, streamed as it is built."""
+    archive = await ArchiveService.prepare(db, folder_id)
+    await db.close()  # the stream opens short sessions of its own
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    headers = {
+        "Content-Disposition": content_disposition(f"{archive.name}.zip", True),
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(
+        ArchiveService.stream(archive), media_type="application/zip", headers=headers
+    )
+
+
+@router.get("/{folder_id}/breadcrumbs", response_model=List[FolderCrumb])
+async def get_breadcrumbs(folder_id: int, db: AsyncSession = Depends(get_db)):
+    breadcrumbs = await FolderService.get_breadcrumbs(db, folder_id)
+    if not breadcrumbs:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return breadcrumbs
+
+
+@router.get("/{folder_id}/descendants", response_model=DescendantCount)
+async def count_descendants(folder_id: int, db: AsyncSession = Depends(get_db)):
+    counts = await FolderService.count_descendants(db, folder_id)
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return counts
+
+
 @router.get("/", response_model=List[FolderTree])
-async def list_folders(db: AsyncSession = Depends(get_db)):
-    return await FolderService.get_folder_tree(db)
+async def list_folders(
+    request: Request,
+    max_depth: Optional[int] = Query(None, ge=0),
+    include_files: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    key = TreeKey(None, max_depth, include_files)
+    return await _tree_response(request, db, key)
 
 
 @router.put("/{folder_id}", response_model=FolderResponse)
@@ -37,9 +169,61 @@ async def update_folder(
     return folder
 
 
+@router.post("/{folder_id}/move", response_model=FolderMoveResponse)
+async def move_folder(
+    folder_id: int, data: FolderMove, db: AsyncSession = Depends(get_db)
+):
+    moved = await FolderService.move_folder(db, folder_id, data.parent_id)
+    if not moved:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    folder, ancestors = moved
+    return {"folder": folder, "ancestors": ancestors}
+
+
 @router.delete("/{folder_id}", response_model=dict)
 async def delete_folder(folder_id: int, db: AsyncSession = Depends(get_db)):
-    success = await FolderService.delete_folder(db, folder_id)
-    if not success:
+    deleted, job_id = await FolderService.delete_folder(db, folder_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return {"deleted": deleted, "cleanup_job_id": job_id}
+
+
+async def _tree_response(request: Request, db: AsyncSession, key: TreeKey):
+    # Returns the cached, already encoded body; response_model on the routes
+    # only documents the shape.
+    snapshot = tree_cache.get(key)
+    if snapshot is None:
+        generation = tree_cache.generation
+        # The version and the tree come from one snapshot, so the cached
+        # body is exactly the one its ETag stands for.
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        version, modified_at = await VersionService.tree_version(db)
+        etag = f'"tree-{version}"'
+        if is_not_modified(request, etag, modified_at):
+            return not_modified(etag, modified_at)
+        tree = await FolderService.get_folder_tree(
+            db, key.folder_id, max_depth=key.max_depth, include_files=key.include_files
+        )
+        snapshot = tree_cache.put(key, tree, version, modified_at, generation)
+
+    if key.folder_id is not None and not snapshot.folder_ids:
         raise HTTPException(status_code=404, detail="Folder not found")
-    return {"deleted": success}
+
+    etag = f'"tree-{snapshot.version}"'
+    if is_not_modified(request, etag, snapshot.modified_at):
+        return not_modified(etag, snapshot.modified_at)
+    return json_response(snapshot.body, cache_headers(etag, snapshot.modified_at))
+
+
+async def _check_tree_version(
+    request: Request, response: Response, db: AsyncSession
+) -> Optional[Response]:
+    # Any folder or file change moves the tree version, so it validates
+    # every partial view of the tree as well. Read before the data, it can
+    # only be older than what is sent, which costs a refetch at worst.
+    version, modified_at = await VersionService.tree_version(db)
+    etag = f'"tree-{version}"'
+    if is_not_modified(request, etag, modified_at):
+        return not_modified(etag, modified_at)
+    response.headers.update(cache_headers(etag, modified_at))
+    return None
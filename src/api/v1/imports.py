@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Header, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from src.core.database import get_db
+from src.schemas.imports import ImportResponse
+from src.services.imports import ImportService
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+
+@router.post("/", response_model=ImportResponse)
+async def import_archive(
+    request: Request,
+    parent_id: Optional[int] = Query(
+        None, description="Folder to import into; top-level folders become roots"
+    ),
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Import a zip of folders and PDFs, sent as the raw request body.
+
+    The tree is created by a background job; follow it at ``/jobs/{job_id}``.
+    """
+    return await ImportService.start(
+        db, request.stream(), parent_id, content_length=content_length
+    )
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+
+from src.core.database import get_db
+from src.schemas.search import SearchPage
+from src.services.search import SearchService
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("/", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=2, max_length=255),
+    type: Optional[Literal["file", "folder"]] = None,
+    folder_id: Optional[int] = Query(None, description="Only search this subtree"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_db),
+):
+    items, next_offset = await SearchService.search(
+        db, q, kind=type, folder_id=folder_id, limit=limit, offset=offset
+    )
+    return {"items": items, "next_offset": next_offset}
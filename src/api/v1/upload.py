@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from src.core.database import get_db
+from src.schemas.file import FileResponse
+from src.schemas.upload import (
+    SHA256_PATTERN,
+    UploadChunkResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from src.services.upload import UploadService
+
+# Included before the files router so "/files/uploads" is not taken for a file id
+router = APIRouter(prefix="/files/uploads", tags=["Uploads"])
+
+
+@router.post("/", response_model=UploadSessionResponse)
+async def create_upload(data: UploadSessionCreate, db: AsyncSession = Depends(get_db)):
+    return await UploadService.create_session(db, data)
+
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+async def get_upload(session_id: str, db: AsyncSession = Depends(get_db)):
+    return await UploadService.get_session(db, session_id)
+
+
+@router.put("/{session_id}/chunks/{index}", response_model=UploadChunkResponse)
+async def put_upload_chunk(
+    session_id: str,
+    request: Request,
+    index: int = Path(..., ge=0),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256", pattern=SHA256_PATTERN),
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    return await UploadService.put_chunk(
+        db,
+        session_id,
+        index,
+        request.stream(),
+        chunk_sha256,
+        content_length=content_length,
+    )
+
+
+@router.post("/{session_id}/complete", response_model=FileResponse)
+async def complete_upload(session_id: str, db: AsyncSession = Depends(get_db)):
+    return await UploadService.complete(db, session_id)
+
+
+@router.delete("/{session_id}", response_model=dict)
+async def abort_upload(session_id: str, db: AsyncSession = Depends(get_db)):
+    aborted = await UploadService.abort(db, session_id)
+    if not aborted:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return {"deleted": aborted}
@@ -9,8 +9,83 @@ class Settings(BaseSettings):
     ENV: str = Field("production", env="ENV")
     DATABASE_URL: str = Field(..., env="DATABASE_URL")  # Para Alembic (sync)
     API_PORT: int = Field(8000, env="API_PORT")
+    # Worker processes, as read by uvicorn/gunicorn
+    WEB_CONCURRENCY: int = Field(1, env="WEB_CONCURRENCY")
     SYNC_DATABASE_URL: str = Field(..., env="SYNC_DATABASE_URL")  # Para Alembic (sync)
 
+    # Database engine
+    DB_ECHO: bool = Field(False, env="DB_ECHO")  # only honoured when ENV=dev
+    DB_SSL: bool = Field(True, env="DB_SSL")
+    DB_POOL_SIZE: int = Field(10, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(10, env="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float = Field(30.0, env="DB_POOL_TIMEOUT")
+    DB_POOL_RECYCLE: int = Field(1800, env="DB_POOL_RECYCLE")
+    DB_POOL_PRE_PING: bool = Field(True, env="DB_POOL_PRE_PING")
+    # Set to 0 behind PgBouncer in transaction pooling mode
+    DB_STATEMENT_CACHE_SIZE: int = Field(100, env="DB_STATEMENT_CACHE_SIZE")
+    # Server-side statement_timeout in milliseconds, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = Field(0, env="DB_STATEMENT_TIMEOUT_MS")
+
+    # Uploads
+    UPLOAD_DIR: str = Field("uploads", env="UPLOAD_DIR")
+    UPLOAD_CHUNK_SIZE: int = Field(1024 * 1024, env="UPLOAD_CHUNK_SIZE")
+    MAX_UPLOAD_SIZE: int = Field(1024 * 1024 * 1024, env="MAX_UPLOAD_SIZE")
+    # Resumable uploads
+    UPLOAD_SESSION_CHUNK_SIZE: int = Field(
+        8 * 1024 * 1024, env="UPLOAD_SESSION_CHUNK_SIZE"
+    )
+    UPLOAD_SESSION_TTL: int = Field(24 * 3600, env="UPLOAD_SESSION_TTL")  # seconds
+    UPLOAD_GC_INTERVAL: float = Field(3600.0, env="UPLOAD_GC_INTERVAL")
+
+    # Bulk imports of zip archives
+    MAX_IMPORT_SIZE: int = Field(50 * 1024 * 1024 * 1024, env="MAX_IMPORT_SIZE")
+    IMPORT_BATCH_SIZE: int = Field(500, env="IMPORT_BATCH_SIZE")  # rows per commit
+    IMPORT_CONCURRENCY: int = Field(8, env="IMPORT_CONCURRENCY")  # blobs at once
+
+    # Folder zip downloads: file rows read per query while streaming
+    ARCHIVE_BATCH_SIZE: int = Field(500, env="ARCHIVE_BATCH_SIZE")
+
+    # Folder tree cache. "postgres" shares invalidations between workers
+    # through LISTEN/NOTIFY; "local" only sees this process's writes, so
+    # other workers serve stale trees, and it is refused with
+    # WEB_CONCURRENCY > 1.
+    TREE_CACHE_BACKEND: str = Field("postgres", env="TREE_CACHE_BACKEND")
+    TREE_CACHE_MAX_ENTRIES: int = Field(256, env="TREE_CACHE_MAX_ENTRIES")
+    TREE_CACHE_TTL: float = Field(300.0, env="TREE_CACHE_TTL")
+
+    # Background jobs
+    JOB_WORKERS_ENABLED: bool = Field(True, env="JOB_WORKERS_ENABLED")
+    JOB_CONCURRENCY: int = Field(4, env="JOB_CONCURRENCY")  # jobs run at once
+    JOB_PROCESSES: int = Field(2, env="JOB_PROCESSES")  # CPU-bound worker processes
+    JOB_POLL_INTERVAL: float = Field(5.0, env="JOB_POLL_INTERVAL")
+    JOB_LEASE_SECONDS: int = Field(300, env="JOB_LEASE_SECONDS")
+    JOB_MAX_ATTEMPTS: int = Field(3, env="JOB_MAX_ATTEMPTS")
+
+    # Change feed
+    CHANGE_FEED_HEARTBEAT: float = Field(15.0, env="CHANGE_FEED_HEARTBEAT")
+    CHANGE_FEED_BATCH_SIZE: int = Field(500, env="CHANGE_FEED_BATCH_SIZE")
+    CHANGE_LOG_RETENTION: int = Field(7 * 24 * 3600, env="CHANGE_LOG_RETENTION")
+    CHANGE_LOG_PRUNE_INTERVAL: float = Field(3600.0, env="CHANGE_LOG_PRUNE_INTERVAL")
+
+    # Request metrics (/metrics) and Server-Timing headers
+    METRICS_ENABLED: bool = Field(True, env="METRICS_ENABLED")
+    SERVER_TIMING_ENABLED: bool = Field(True, env="SERVER_TIMING_ENABLED")
+
+    # Profiler: every request with PROFILE_REQUESTS, otherwise only requests
+    # sent with "X-Profile: 1" (or "cpu"). Those, and the /admin/profiles
+    # routes, also need "X-Profile-Token: <PROFILE_TOKEN>"; profiles hold SQL
+    # with bind parameters and trigger EXPLAIN ANALYZE, so both are off
+    # while PROFILE_TOKEN is empty.
+    PROFILE_REQUESTS: bool = Field(False, env="PROFILE_REQUESTS")
+    PROFILE_TOKEN: str = Field("", env="PROFILE_TOKEN")
+    PROFILE_CPU: bool = Field(False, env="PROFILE_CPU")  # sample stacks too
+    PROFILE_BUFFER_SIZE: int = Field(50, env="PROFILE_BUFFER_SIZE")
+    PROFILE_MAX_STATEMENTS: int = Field(1000, env="PROFILE_MAX_STATEMENTS")
+    PROFILE_SLOW_QUERY_MS: float = Field(100.0, env="PROFILE_SLOW_QUERY_MS")
+    PROFILE_MAX_EXPLAINS: int = Field(5, env="PROFILE_MAX_EXPLAINS")
+    PROFILE_EXPLAIN_TIMEOUT_MS: int = Field(10000, env="PROFILE_EXPLAIN_TIMEOUT_MS")
+    PROFILE_SAMPLE_INTERVAL: float = Field(0.005, env="PROFILE_SAMPLE_INTERVAL")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,16 +1,74 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import ssl
 from src.core.config import settings
 
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
+# SQLSTATE of the error PostgreSQL aborts one side of a deadlock with
+DEADLOCK_DETECTED = "40P01"
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_wait_stats.timeouts += 1
+            raise
+        finally:
+            pool_wait_stats.record(time.perf_counter() - start)
+
+
+def _connect_args() -> dict:
+    connect_args = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_SSL:
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        connect_args["ssl"] = ssl_context
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+        }
+    return connect_args
+
+
+database_url = make_url(settings.DATABASE_URL).update_query_dict(
+    {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+)
 
 engine = create_async_engine(
-    settings.DATABASE_URL,
-    connect_args={"ssl": ssl_context},
-    echo=True,
+    database_url,
+    connect_args=_connect_args(),
+    echo=settings.ENV == "dev" and settings.DB_ECHO,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
 )
 
 Base = declarative_base()
@@ -25,3 +83,22 @@ AsyncSessionLocal = sessionmaker(
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def pool_metrics() -> dict:
+    pool = engine.sync_engine.pool
+    checkouts = pool_wait_stats.checkouts
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "timeouts": pool_wait_stats.timeouts,
+        "wait_seconds_total": pool_wait_stats.total_wait,
+        "wait_seconds_avg": (
+            pool_wait_stats.total_wait / checkouts if checkouts else 0.0
+        ),
+        "wait_seconds_max": pool_wait_stats.max_wait,
+    }
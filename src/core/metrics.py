@@ -0,0 +1,230 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# Label for requests that matched no route, so 404 scans can't add series
+UNMATCHED = "unmatched"
+# Same for made-up request methods
+OTHER_METHOD = "other"
+METHODS = frozenset(
+    ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"]
+)
+
+
+class RequestTimings:
+    """Database work done on behalf of the current request."""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # bucket counts, then +Inf, sum
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _labels(self.labels, labels)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {total}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], value: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, labels)}}} {value}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    escaped = (
+        value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        for value in values
+    )
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class RequestMetrics:
+    """Per-route request latency and database usage.
+
+    Observations are plain dict and list updates on the event loop thread,
+    so recording costs a few microseconds per request.
+    """
+
+    def __init__(self):
+        self.duration = Histogram(
+            "http_request_duration_seconds",
+            "Time from receiving a request to the end of its response.",
+            ("method", "route"),
+            LATENCY_BUCKETS,
+        )
+        self.db_duration = Histogram(
+            "http_request_db_duration_seconds",
+            "Time spent in database statements per request.",
+            ("method", "route"),
+            LATENCY_BUCKETS,
+        )
+        self.queries = Histogram(
+            "http_request_db_queries",
+            "Database statements executed per request.",
+            ("method", "route"),
+            QUERY_BUCKETS,
+        )
+        self.responses = Counter(
+            "http_responses_total",
+            "Responses sent, by status code.",
+            ("method", "route", "status"),
+        )
+
+    def record(
+        self, method: str, route: str, status: int, elapsed: float, db: RequestTimings
+    ) -> None:
+        labels = (method, route)
+        self.duration.observe(labels, elapsed)
+        self.db_duration.observe(labels, db.db_time)
+        self.queries.observe(labels, db.queries)
+        self.responses.inc((method, route, str(status)))
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        lines = []
+        for metric in (self.duration, self.db_duration, self.queries, self.responses):
+            lines.extend(metric.render())
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Add every statement's duration to the current request's timings.
+
+    Statements run outside a request (jobs, periodic tasks) are not counted.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, params, context, many):
+        timings = _current.get()
+        if timings is not None and conn.info.get("query_started"):
+            timings.queries += 1
+            timings.db_time += time.perf_counter() - conn.info["query_started"].pop()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+class TimingMiddleware:
+    """Records request metrics and adds a ``Server-Timing`` header.
+
+    The header is sent with the response start, so for streamed responses
+    it covers the time until the first byte; the histograms cover the whole
+    response.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = _server_timing(timings, time.perf_counter() - started)
+                    message["headers"] = [
+                        *message.get("headers", ()),
+                        (b"server-timing", header),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            method = scope["method"]
+            request_metrics.record(
+                method if method in METHODS else OTHER_METHOD,
+                getattr(route, "path", UNMATCHED),
+                status,
+                time.perf_counter() - started,
+                timings,
+            )
+
+
+def _server_timing(timings: RequestTimings, elapsed: float) -> bytes:
+    db_ms = timings.db_time * 1000
+    return (
+        f'db;dur={db_ms:.1f};desc="{timings.queries} queries", '
+        f"app;dur={elapsed * 1000 - db_ms:.1f}, total;dur={elapsed * 1000:.1f}"
+    ).encode()
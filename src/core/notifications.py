@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Text, event, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from src.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+Handler = Callable[[str], None]
+
+PENDING_KEY = "pending_notifications"
+
+
+class PgListener:
+    """One LISTEN connection per process, shared by every channel subscriber.
+
+    ``on_reconnect`` callbacks run after the connection was lost and
+    re-established, since notifications sent in the meantime are gone.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._handlers: dict[str, list[Handler]] = {}
+        self._reconnect_callbacks: list[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_reconnect(self, callback: Callable[[], None]) -> None:
+        self._reconnect_callbacks.append(callback)
+
+    async def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _dispatch(self, connection, pid, channel: str, payload: str) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Notification handler for %s failed", channel)
+
+    async def _listen(self, connection: AsyncConnection, reconnected: bool) -> None:
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+        lost = asyncio.Event()
+        driver.add_termination_listener(lambda _: lost.set())
+        for channel in self._handlers:
+            await driver.add_listener(channel, self._dispatch)
+        if reconnected:
+            for callback in self._reconnect_callbacks:
+                callback()
+        await lost.wait()
+
+    async def _run(self) -> None:
+        delay = RECONNECT_DELAY
+        connected_before = False
+        while True:
+            try:
+                async with self.engine.connect() as connection:
+                    reconnected, connected_before = connected_before, True
+                    delay = RECONNECT_DELAY
+                    await self._listen(connection, reconnected)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("LISTEN connection failed, retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+listener = PgListener(engine)
+
+
+def notify_on_commit(db: AsyncSession, channel: str, payload: str) -> None:
+    """Send a notification with the transaction of ``db``.
+
+    It is queued rather than sent right away, so the next statement that
+    takes ``pending_notifications`` can carry it; whatever is left goes out
+    in one statement before the commit.
+    """
+    db.info.setdefault(PENDING_KEY, []).append((channel, payload))
+
+
+def pending_notifications(info: dict):
+    """Take the notifications queued in a session's ``info`` as one scalar
+    expression, or None. Adding it to a statement sends them with it.
+    """
+    pending: List[Tuple[str, str]] = info.pop(PENDING_KEY, [])
+    if not pending:
+        return None
+    queued = (
+        func.unnest(
+            literal([channel for channel, _ in pending], ARRAY(Text)),
+            literal([payload for _, payload in pending], ARRAY(Text)),
+        )
+        .table_valued("channel", "payload")
+        .render_derived()
+    )
+    return (
+        select(func.count(func.pg_notify(queued.c.channel, queued.c.payload)))
+        .select_from(queued)
+        .scalar_subquery()
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _send_pending(session: Session) -> None:
+    notified = pending_notifications(session.info)
+    if notified is not None:
+        session.execute(select(notified))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,76 @@
+"""CPU-bound PDF processing.
+
+Everything here runs inside the job worker's process pool, so functions must
+be importable at module level and only take and return picklable values.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from pypdf import PdfReader
+
+# Enough for search; very long documents are truncated
+MAX_TEXT_CHARS = 1_000_000
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_TIMEOUT = 60
+
+
+def extract_metadata(path: str, thumbnail_path: str) -> dict:
+    reader = PdfReader(path)
+    return {
+        "page_count": len(reader.pages),
+        "text_content": _extract_text(reader),
+        "has_thumbnail": render_thumbnail(path, thumbnail_path),
+    }
+
+
+def _extract_text(reader: PdfReader) -> str:
+    parts = []
+    remaining = MAX_TEXT_CHARS
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        parts.append(text[:remaining])
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            break
+    # PostgreSQL text columns cannot hold NUL characters
+    return "\n".join(parts).replace("\x00", "")
+
+
+def render_thumbnail(path: str, thumbnail_path: str) -> bool:
+    """Render the first page as a PNG with poppler's ``pdftoppm``.
+
+    Returns False when poppler is not installed, so thumbnails stay optional.
+    """
+    if os.path.exists(thumbnail_path):
+        return True
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm is None:
+        return False
+
+    directory = os.path.dirname(thumbnail_path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        prefix = os.path.join(tmp, "page")
+        subprocess.run(
+            [
+                pdftoppm,
+                "-png",
+                "-singlefile",
+                "-f",
+                "1",
+                "-l",
+                "1",
+                "-scale-to",
+                str(THUMBNAIL_WIDTH),
+                path,
+                prefix,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=THUMBNAIL_TIMEOUT,
+        )
+        os.replace(prefix + ".png", thumbnail_path)
+    return True
@@ -0,0 +1,346 @@
+import hmac
+import itertools
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+TOKEN_HEADER = b"x-profile-token"
+PARAM_REPR_LIMIT = 200
+TOP_STACKS = 100
+
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|SHARE)\b")
+_CALLS = re.compile(r"\b([A-Z_][A-Z0-9_]*)\s*\(")
+# "WITH tree(id, ...) AS (" names a CTE rather than calling a function
+_CTE_NAMES = re.compile(r"\b([A-Z_][A-Z0-9_]*)\s*\([^()]*\)\s*AS\s*\(")
+# Keywords, types and side-effect free functions that may appear before a
+# "(" in a statement EXPLAIN ANALYZE is allowed to run. Anything else, such
+# as nextval() or pg_advisory_xact_lock(), may change state that a rollback
+# does not undo.
+_READ_ONLY_CALLS = frozenset(
+    """
+    ALL AND ANY ARRAY AS BY CASE EXISTS FILTER FROM IN JOIN LATERAL NOT ON OR
+    OVER ROW SELECT THEN USING VALUES WHEN WHERE WITH
+    BIGINT INTEGER NUMERIC VARCHAR
+    ABS ARRAY_AGG ARRAY_LENGTH AVG BOOL_OR CAST COALESCE COUNT GREATEST LEAST
+    LEFT LENGTH LOWER MAX MIN NOW NULLIF ROW_NUMBER SPLIT_PART STARTS_WITH
+    STRING_TO_ARRAY SUBSTR SUM TO_TSQUERY TO_TSVECTOR TRIM UNNEST UPPER
+    """.split()
+)
+
+
+class Profile:
+    """Everything recorded for one profiled request."""
+
+    def __init__(self, profile_id: int, method: str, path: str, max_statements: int):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.max_statements = max_statements
+        self.started_at = datetime.now(timezone.utc)
+        self.status: Optional[int] = None
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.statement_count = 0
+        self.statements: List[dict] = []
+        self.cpu: Optional[List[dict]] = None
+        # Slow SELECTs with their raw parameters, for EXPLAIN after the request
+        self.slow: List[tuple] = []
+
+    def record(
+        self, statement: str, params, many: bool, elapsed: float
+    ) -> Optional[int]:
+        """Count the statement, and keep it while under the limit."""
+        self.statement_count += 1
+        self.db_time += elapsed
+        if len(self.statements) >= self.max_statements:
+            return None
+        self.statements.append(
+            {
+                "sql": statement,
+                "params": _describe_params(params, many),
+                "duration_ms": elapsed * 1000,
+                "explain": None,
+            }
+        )
+        return len(self.statements) - 1
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": self.duration * 1000,
+            "db_ms": self.db_time * 1000,
+            "statements": self.statement_count,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "statements_truncated": self.statement_count > len(self.statements),
+            "queries": self.statements,
+            "cpu": self.cpu,
+        }
+
+
+def _describe_params(params, many: bool):
+    if many:
+        # executemany: the first row shows the shape, the count the volume
+        rows = list(params or ())
+        return {"rows": len(rows), "first": _short_repr(rows[0]) if rows else None}
+    return _short_repr(params)
+
+
+def _short_repr(value) -> str:
+    shown = repr(value)
+    if len(shown) > PARAM_REPR_LIMIT:
+        return shown[:PARAM_REPR_LIMIT] + "..."
+    return shown
+
+
+class ProfileStore:
+    """The most recent profiles, oldest dropped first."""
+
+    def __init__(self, size: int):
+        self._profiles: deque = deque(maxlen=size)
+        self._ids = itertools.count(1)
+
+    def new(self, method: str, path: str, max_statements: int) -> Profile:
+        return Profile(next(self._ids), method, path, max_statements)
+
+    def add(self, profile: Profile) -> None:
+        self._profiles.append(profile)
+
+    def list(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+
+
+def capture_statements(engine: Engine, slow_query_ms: float) -> None:
+    """Record every statement run while a profile is active."""
+    slow_query = slow_query_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, params, context, many):
+        profile = _current.get()
+        if profile is None or not conn.info.get("profile_started"):
+            return
+        elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+        index = profile.record(statement, params, many, elapsed)
+        explain = not many and elapsed >= slow_query and _explainable(statement)
+        if index is not None and explain:
+            profile.slow.append((elapsed, index, statement, params))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("profile_started"):
+            connection.info["profile_started"].pop()
+
+
+def _explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE runs the statement, so only plain table reads qualify:
+    # no data-modifying CTEs, no row locks and no functions with side effects
+    upper = statement.lstrip().upper()
+    return (
+        upper.startswith(("SELECT", "WITH"))
+        and re.search(r"\bFROM\b", upper) is not None
+        and not _WRITES.search(upper)
+        and _only_read_only_calls(upper)
+    )
+
+
+def _only_read_only_calls(upper: str) -> bool:
+    allowed = _READ_ONLY_CALLS.union(_CTE_NAMES.findall(upper))
+    return all(name in allowed for name in _CALLS.findall(upper))
+
+
+def token_matches(supplied: Optional[str], token: str) -> bool:
+    """Whether ``supplied`` is the profiler token; never with no token set."""
+    if not token or supplied is None:
+        return False
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+async def explain_slow(
+    engine: AsyncEngine, profile: Profile, limit: int, timeout_ms: int
+) -> None:
+    """Attach ``EXPLAIN (ANALYZE, BUFFERS)`` output to the slowest statements.
+
+    Runs on its own connection once the response has been sent, inside a
+    transaction that is always rolled back.
+    """
+    slowest = sorted(profile.slow, key=lambda entry: entry[0], reverse=True)[:limit]
+    profile.slow = []
+    for _, index, statement, params in slowest:
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + statement, params
+                )
+                plan = "\n".join(row[0] for row in result)
+                await conn.rollback()
+        except DBAPIError as error:
+            plan = f"EXPLAIN failed: {error.orig or error}"
+        profile.statements[index]["explain"] = plan
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer.
+
+    The event loop thread runs every in-flight request, so concurrent
+    requests show up in the samples too, and time spent waiting on the
+    database appears as the loop's selector call.
+    """
+
+    _running = threading.Lock()
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> bool:
+        # One sampler at a time keeps the overhead bounded
+        if not self._running.acquire(blocking=False):
+            return False
+        self._thread.start()
+        return True
+
+    def stop(self) -> List[dict]:
+        self._stop.set()
+        self._thread.join()
+        self._running.release()
+        return [
+            {"stack": stack, "samples": count}
+            for stack, count in self.samples.most_common(TOP_STACKS)
+        ]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_fold(frame)] += 1
+
+
+def _fold(frame) -> str:
+    """The stack as ``outer;...;inner``, the folded format flame graphs use."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class ProfilerMiddleware:
+    """Profiles every request, or only those sent with an ``X-Profile``
+    header (``1`` for SQL, ``cpu`` to sample stacks as well) and the
+    ``X-Profile-Token`` matching ``token``.
+
+    Profiled responses carry ``X-Profile-Id``; the profile itself is kept in
+    ``store`` and served by the admin API.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        engine: AsyncEngine,
+        store: ProfileStore,
+        always: bool,
+        token: str,
+        cpu: bool,
+        max_statements: int,
+        max_explains: int,
+        explain_timeout_ms: int,
+        sample_interval: float,
+    ):
+        self.app = app
+        self.engine = engine
+        self.store = store
+        self.always = always
+        self.token = token
+        self.cpu = cpu
+        self.max_statements = max_statements
+        self.max_explains = max_explains
+        self.explain_timeout_ms = explain_timeout_ms
+        self.sample_interval = sample_interval
+
+    def _mode(self, scope: Scope) -> Optional[bool]:
+        """None to skip the request, else whether to sample the CPU."""
+        headers = dict(scope["headers"])
+        value = headers.get(PROFILE_HEADER, b"").strip().lower()
+        if value and value not in (b"0", b"false"):
+            supplied = headers.get(TOKEN_HEADER, b"").decode("latin-1")
+            if token_matches(supplied, self.token):
+                return value == b"cpu"
+        return self.cpu if self.always else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cpu = self._mode(scope) if scope["type"] == "http" else None
+        if cpu is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.store.new(scope["method"], scope["path"], self.max_statements)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-profile-id", str(profile.id).encode()),
+                ]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        sampling = cpu and sampler.start()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration = time.perf_counter() - started
+            _current.reset(token)
+            if sampling:
+                profile.cpu = sampler.stop()
+            self.store.add(profile)
+        if profile.slow:
+            await explain_slow(
+                self.engine, profile, self.max_explains, self.explain_timeout_ms
+            )
+
+
+profile_store = ProfileStore(settings.PROFILE_BUFFER_SIZE)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional, Tuple
+from urllib.parse import quote
+
+import aiofiles
+from fastapi import Response
+from pydantic_core import PydanticSerializationError, to_json
+from starlette.types import Receive, Scope, Send
+
+# Blobs are content-addressed, so the bytes behind a given ETag never change
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Same format pydantic uses for aware datetimes
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode data that already has the response shape, skipping validation.
+
+    Only for payloads built by our own code, e.g. assembled folder trees.
+    """
+    try:
+        return to_json(content)
+    except PydanticSerializationError:
+        # to_json caps the nesting depth; very deep trees take the slow path
+        return json.dumps(
+            content, default=_json_default, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    return Response(body, headers=headers, media_type="application/json")
+
+
+def content_disposition(filename: str, attachment: bool = False) -> str:
+    kind = "attachment" if attachment else "inline"
+    fallback = filename.encode("ascii", "replace").decode().replace('"', "")
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+class BlobResponse(Response):
+    """Send a stored file, or one byte range of it, without buffering it.
+
+    The body goes out through the ASGI zero-copy extension (``sendfile``) when
+    the server advertises it, then ``pathsend`` for whole files, and falls back
+    to chunked reads otherwise.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        byte_range: Optional[Tuple[int, int]] = None,
+        headers: Optional[dict] = None,
+        media_type: Optional[str] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.start, end = byte_range if byte_range else (0, size - 1)
+        self.length = end - self.start + 1
+        self.partial = byte_range is not None
+
+        super().__init__(
+            status_code=206 if self.partial else 200,
+            headers=headers,
+            media_type=media_type,
+        )
+        self.headers["Accept-Ranges"] = "bytes"
+        self.headers["Content-Length"] = str(self.length)
+        if self.partial:
+            self.headers["Content-Range"] = f"bytes {self.start}-{end}/{size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopysend" in extensions:
+            await self._zerocopy(send)
+        elif "http.response.pathsend" in extensions and not self.partial:
+            await send({"type": "http.response.pathsend", "path": self.path})
+        else:
+            await self._chunked(send)
+        if self.background is not None:
+            await self.background()
+
+    async def _zerocopy(self, send: Send) -> None:
+        file = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            await send(
+                {
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": self.length,
+                }
+            )
+        finally:
+            await asyncio.to_thread(file.close)
+
+    async def _chunked(self, send: Send) -> None:
+        remaining = self.length
+        async with aiofiles.open(self.path, "rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+        if remaining > 0:
+            # The blob shrank underneath us; end the body rather than hang
+            await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from src.core.config import settings
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    path: str
+    sha256: str
+    size: int
+
+
+async def iter_upload(
+    uploaded_file: UploadFile, chunk_size: int | None = None
+) -> AsyncIterator[bytes]:
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    while chunk := await uploaded_file.read(chunk_size):
+        yield chunk
+
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def write_stream(
+    chunks: AsyncIterator[bytes],
+    destination: str,
+    max_size: int | None = None,
+) -> StoredFile:
+    """Copy ``chunks`` to ``destination`` without holding the payload in memory.
+
+    Data is written to a temporary file next to the destination, hashed as it
+    streams and atomically renamed once it has been flushed to disk, so readers
+    never observe a partially written file.
+    """
+    max_size = max_size if max_size is not None else settings.MAX_UPLOAD_SIZE
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    tmp_path = f"{destination}.{uuid.uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out_file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the maximum size of {max_size} bytes",
+                    )
+                digest.update(chunk)
+                await out_file.write(chunk)
+            await out_file.flush()
+            await asyncio.to_thread(os.fsync, out_file.fileno())
+        os.replace(tmp_path, destination)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+    return StoredFile(path=destination, sha256=digest.hexdigest(), size=size)
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    sha256: str
+    size: int
+    created: bool
+
+
+class BlobStore:
+    """Content-addressed storage: every blob lives at ``<root>/ab/cd/<sha256>``."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    async def exists(self, sha256: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.path_for(sha256))
+
+    async def put(
+        self,
+        open_chunks: Callable[[], AsyncIterator[bytes]],
+        max_size: int | None = None,
+    ) -> BlobRef:
+        """Store the bytes yielded by ``open_chunks``.
+
+        The source is hashed first and only copied when no blob with the same
+        digest exists yet, so duplicate uploads never touch the disk. The
+        factory is called once more for the copy, so it must be re-readable.
+        """
+        max_size = max_size if max_size is not None else settings.MAX_UPLOAD_SIZE
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in open_chunks():
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File exceeds the maximum size of {max_size} bytes",
+                )
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        if await self.exists(sha256):
+            return BlobRef(sha256=sha256, size=size, created=False)
+
+        stored = await write_stream(open_chunks(), self.path_for(sha256), max_size)
+        if stored.sha256 != sha256:
+            remove_quietly(stored.path)
+            raise HTTPException(
+                status_code=409, detail="Upload changed while it was being stored"
+            )
+        return BlobRef(sha256=sha256, size=size, created=True)
+
+    async def put_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        max_size: int | None = None,
+        expected_sha256: str | None = None,
+    ) -> BlobRef:
+        """Store ``chunks`` in a single pass, hashing while writing.
+
+        Suited to sources that are cheap to read once but not twice; the bytes
+        go to a temporary file and are renamed into place, or dropped when the
+        blob already exists.
+        """
+        incoming = os.path.join(self.root, "incoming", uuid.uuid4().hex)
+        stored = await write_stream(chunks, incoming, max_size)
+        if expected_sha256 is not None and stored.sha256 != expected_sha256:
+            remove_quietly(incoming)
+            raise HTTPException(status_code=400, detail="Upload checksum mismatch")
+
+        destination = self.path_for(stored.sha256)
+        if await self.exists(stored.sha256):
+            remove_quietly(incoming)
+            return BlobRef(sha256=stored.sha256, size=stored.size, created=False)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(incoming, destination)
+        return BlobRef(sha256=stored.sha256, size=stored.size, created=True)
+
+    async def size(self, sha256: str) -> int | None:
+        """Size of the stored blob in bytes, or None when it is missing."""
+        try:
+            stat_result = await asyncio.to_thread(os.stat, self.path_for(sha256))
+        except FileNotFoundError:
+            return None
+        return stat_result.st_size
+
+    async def delete(self, sha256: str) -> None:
+        await asyncio.to_thread(remove_quietly, self.path_for(sha256))
+
+
+def upload_chunks(uploaded_file: UploadFile) -> Callable[[], AsyncIterator[bytes]]:
+    async def open_chunks() -> AsyncIterator[bytes]:
+        await uploaded_file.seek(0)
+        async for chunk in iter_upload(uploaded_file):
+            yield chunk
+
+    return open_chunks
+
+
+blob_store = BlobStore(os.path.join(settings.UPLOAD_DIR, "blobs"))
+# First-page previews, keyed by the hash of the blob they were rendered from
+thumbnail_store = BlobStore(os.path.join(settings.UPLOAD_DIR, "thumbnails"))
@@ -1,16 +1,74 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
 from src.core.config import settings
+from src.core.database import DEADLOCK_DETECTED, engine, pool_metrics
+from src.core.metrics import TimingMiddleware, instrument_engine, request_metrics
+from src.core.notifications import listener
+from src.core.profiler import ProfilerMiddleware, capture_statements, profile_store
+from src.services.changes import change_feed, change_log_pruner
+from src.services.cleanup import RELEASE_BLOBS, release_blobs
+from src.services.folder_stats import REPAIR_FOLDER_STATS, repair_folder_stats
+from src.services.imports import IMPORT_ARCHIVE, import_archive
+from src.services.processing import PROCESS_PDF, process_pdf
+from src.services.tree_cache import tree_cache
+from src.services.upload import upload_gc
+from src.services.worker import job_worker
+
+from src.api.v1 import admin, changes, file, folder, imports, job, search, upload
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tree_cache.backend.attach(tree_cache, listener)
+    change_feed.attach(listener)
+    if settings.JOB_WORKERS_ENABLED:
+        job_worker.register(PROCESS_PDF, process_pdf)
+        job_worker.register(RELEASE_BLOBS, release_blobs)
+        job_worker.register(REPAIR_FOLDER_STATS, repair_folder_stats)
+        job_worker.register(IMPORT_ARCHIVE, import_archive)
+        job_worker.attach(listener)
+    await listener.start()
+    await job_worker.start()
+    upload_gc.start()
+    change_log_pruner.start()
+    yield
+    await change_log_pruner.stop()
+    await upload_gc.stop()
+    await job_worker.stop()
+    await listener.stop()
 
-from src.api.v1 import file, folder
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+
+@app.exception_handler(DBAPIError)
+async def database_error(request: Request, error: DBAPIError):
+    # Folder rows are locked in id order, but a subtree delete racing a write
+    # inside that subtree can still deadlock; PostgreSQL aborts one of them
+    if getattr(error.orig, "sqlstate", None) == DEADLOCK_DETECTED:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Conflicting concurrent change, please retry"},
+        )
+    raise error
+
+
 app.include_router(folder.router, prefix="/api/v1")
+app.include_router(upload.router, prefix="/api/v1")
 app.include_router(file.router, prefix="/api/v1")
+app.include_router(search.router, prefix="/api/v1")
+app.include_router(changes.router, prefix="/api/v1")
+app.include_router(imports.router, prefix="/api/v1")
+app.include_router(job.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
 
 origins = [
     "http://localhost:5173",
@@ -23,8 +81,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # GET, POST, PUT, DELETE...
     allow_headers=["*"],  # cabeceras permitidas
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine.sync_engine)
+    # Added last so it also times the CORS middleware
+    app.add_middleware(TimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        gauges = {
+            f"db_pool_{name}": value
+            for name, value in pool_metrics().items()
+            if isinstance(value, (int, float))
+        }
+        return Response(
+            request_metrics.render(gauges),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+if settings.PROFILE_REQUESTS or settings.PROFILE_TOKEN:
+    capture_statements(engine.sync_engine, settings.PROFILE_SLOW_QUERY_MS)
+    # Outermost, so EXPLAINs run after the timing middleware has recorded
+    app.add_middleware(
+        ProfilerMiddleware,
+        engine=engine,
+        store=profile_store,
+        always=settings.PROFILE_REQUESTS,
+        token=settings.PROFILE_TOKEN,
+        cpu=settings.PROFILE_CPU,
+        max_statements=settings.PROFILE_MAX_STATEMENTS,
+        max_explains=settings.PROFILE_MAX_EXPLAINS,
+        explain_timeout_ms=settings.PROFILE_EXPLAIN_TIMEOUT_MS,
+        sample_interval=settings.PROFILE_SAMPLE_INTERVAL,
+    )
+
 
 @app.get("/", tags=["Health"])
 def health_check():
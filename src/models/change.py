@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, Integer, String, DateTime, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from src.core.database import Base
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Id of the transaction that made the change; clients resume from it
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    entity: Mapped[str] = mapped_column(String(20), nullable=False)  # file | folder
+    action: Mapped[str] = mapped_column(String(20), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
@@ -1,31 +1,65 @@
 from datetime import datetime
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from sqlalchemy import ForeignKey, String, Integer, DateTime, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    text,
+)
 
 from src.core.database import Base
 
 
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        # Keyset pagination of a folder's files; these also serve folder_id lookups.
+        Index("ix_files_folder_id_name_id", "folder_id", "name", "id"),
+        Index("ix_files_folder_id_created_at_id", "folder_id", "created_at", "id"),
+        Index("ix_files_folder_id_updated_at_id", "folder_id", "updated_at", "id"),
+        # Name search, see SearchService
+        Index(
+            "ix_files_name_search",
+            text("to_tsvector('simple'::regconfig, name)"),
+            postgresql_using="gin",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     extension: Mapped[str] = mapped_column(String(10), nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(
+        String(64), nullable=True, index=True
+    )
+    # Unknown for files stored before sizes were recorded, until the folder
+    # stats repair job fills it in
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    # Filled in by the post-upload processing job
+    page_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    has_thumbnail: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default="false"
+    )
+    text_content: Mapped[str | None] = mapped_column(Text, nullable=True, deferred=True)
+    processed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
     folder_id: Mapped[int] = mapped_column(
-        Integer,
-        ForeignKey("folders.id", ondelete="CASCADE"),
-        nullable=False
+        Integer, ForeignKey("folders.id", ondelete="CASCADE"), nullable=False
     )
 
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
-        server_default=func.now()
+        DateTime(timezone=True), server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
-        server_default=func.now(),
-        onupdate=func.now()
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
 
     folder: Mapped["Folder"] = relationship("Folder", back_populates="files")
@@ -1,46 +1,82 @@
 from datetime import datetime
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from sqlalchemy import ForeignKey, String, Integer, DateTime, func
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    text,
+)
 
 from src.core.database import Base
 
 
 class Folder(Base):
     __tablename__ = "folders"
+    __table_args__ = (
+        Index("ix_folders_path", "path", postgresql_ops={"path": "text_pattern_ops"}),
+        # Name search, see SearchService
+        Index(
+            "ix_folders_name_search",
+            text("to_tsvector('simple'::regconfig, name)"),
+            postgresql_using="gin",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
 
     parent_id: Mapped[int | None] = mapped_column(
-        Integer,
-        ForeignKey("folders.id", ondelete="CASCADE"),
-        nullable=True
+        Integer, ForeignKey("folders.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+
+    # Materialized ancestry, e.g. "/1/5/9/" for folder 9 under 5 under 1.
+    path: Mapped[str] = mapped_column(Text, nullable=False)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Bumped whenever a file is added to, removed from or changed in this folder
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+    # Rollups kept current by FolderStatsService; total_* cover the subtree
+    file_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    subfolder_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0"
+    )
+    total_file_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0"
+    )
+    total_folder_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0"
+    )
+    total_bytes: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default="0"
     )
 
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
-        server_default=func.now()
+        DateTime(timezone=True), server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
-        server_default=func.now(),
-        onupdate=func.now()
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
 
     parent: Mapped["Folder"] = relationship(
-        "Folder",
-        remote_side="Folder.id",
-        back_populates="subfolders"
+        "Folder", remote_side="Folder.id", back_populates="subfolders"
     )
 
     subfolders: Mapped[list["Folder"]] = relationship(
         "Folder",
         back_populates="parent",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        # Rows below a deleted folder are removed by ON DELETE CASCADE
+        passive_deletes=True,
     )
 
     files: Mapped[list["File"]] = relationship(
         "File",
         back_populates="folder",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Index, Integer, String, Text, DateTime, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from src.core.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim queries look for the oldest runnable job
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    file_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
+
+    # queued -> running -> succeeded | failed
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, server_default="queued"
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="3"
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Units of work done out of ``total``, for long-running jobs
+    progress: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    total: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Lease of the worker running the job; expired leases are claimed again
+    locked_until: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,29 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+MAX_BULK_ITEMS = 1000
+
+
+class BulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkRenameItem(BaseModel):
+    id: int
+    name: str = Field(..., min_length=1, max_length=255)
+
+
+class BulkRename(BaseModel):
+    items: List[BulkRenameItem] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    id: int
+    status: Literal["moved", "updated", "deleted", "not_found", "invalid"]
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+    cleanup_job_id: Optional[int] = Field(
+        None, description="Job removing stored content, see GET /jobs/{job_id}"
+    )
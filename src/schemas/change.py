@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+
+class ChangeEntry(BaseModel):
+    version: int
+    entity: Literal["file", "folder"]
+    action: Literal["created", "updated", "moved", "deleted"]
+    entity_id: int
+    data: dict = Field(
+        ..., description="Changed fields, e.g. name, folder_id or parent_id"
+    )
+    created_at: datetime
+
+
+class ChangePage(BaseModel):
+    items: List[ChangeEntry]
+    latest_version: int
+    next_since: int = Field(..., description="Pass as `since` to continue")
+    reset: bool = Field(
+        ...,
+        description="The log no longer reaches back to `since`; reload the "
+        "tree and continue from `next_since`",
+    )
@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+
+from src.schemas.bulk import BulkIds
 
 
 class FileBase(BaseModel):
@@ -32,13 +34,32 @@ class FileUpdate(BaseModel):
         return ext
 
 
+class FileBulkMove(BulkIds):
+    folder_id: int = Field(..., description="Folder the files are moved into")
+
+
 class FileResponse(BaseModel):
     id: int
     name: str
     extension: str
     folder_id: int
+    size_bytes: Optional[int] = None
+    page_count: Optional[int] = None
+    has_thumbnail: bool = False
+    processed_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class FilePage(BaseModel):
+    items: List[FileResponse]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next page"
+    )
+
+
+# Built once; validates ORM rows and dumps JSON without FastAPI's extra passes
+file_page_adapter = TypeAdapter(FilePage)
@@ -2,6 +2,8 @@ from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from src.schemas.bulk import BulkIds
+
 
 class FolderBase(BaseModel):
     name: str = Field(..., example="Financial Documents")
@@ -18,17 +20,53 @@ class FolderUpdate(BaseModel):
     parent_id: Optional[int] = None
 
 
+class FolderMove(BaseModel):
+    parent_id: Optional[int] = Field(
+        None, description="ID of the new parent folder, or null to move to the root"
+    )
+
+
+class FolderBulkMove(BulkIds):
+    parent_id: Optional[int] = Field(
+        None, description="ID of the new parent folder, or null to move to the root"
+    )
+
+
 class FolderResponse(BaseModel):
     id: int
     name: str
     parent_id: Optional[int]
     created_at: datetime
     updated_at: datetime
+    file_count: int = 0
+    subfolder_count: int = 0
+    total_file_count: int = 0
+    total_folder_count: int = 0
+    total_bytes: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class FolderCrumb(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int]
 
     class Config:
         from_attributes = True
 
 
+class FolderMoveResponse(BaseModel):
+    folder: FolderResponse
+    ancestors: List[FolderCrumb]
+
+
+class DescendantCount(BaseModel):
+    folder_count: int
+    file_count: int
+
+
 class FileInFolder(BaseModel):
     id: int
     name: str
@@ -39,6 +77,28 @@ class FileInFolder(BaseModel):
         from_attributes = True
 
 
+class FolderNode(BaseModel):
+    """A folder as drawn in a lazily expanded tree."""
+
+    id: int
+    name: str
+    parent_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    child_folder_count: int
+    file_count: int
+    total_folder_count: int
+    total_file_count: int
+    total_bytes: int
+    has_children: bool
+
+
+class FolderChildren(BaseModel):
+    id: int
+    folders: List[FolderNode]
+    files: List[FileInFolder] = []
+
+
 class FolderTree(BaseModel):
     id: int
     name: str
@@ -53,4 +113,4 @@ class FolderTree(BaseModel):
         from_attributes = True
 
 
-FolderTree.update_forward_refs()
+FolderTree.model_rebuild()
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class ImportResponse(BaseModel):
+    job_id: int
+    folders: int
+    files: int
+    # Entries left out: anything but PDFs, hidden files, oversized members
+    skipped: int
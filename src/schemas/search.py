@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+from src.schemas.folder import FolderCrumb
+
+
+class SearchHit(BaseModel):
+    type: Literal["file", "folder"]
+    id: int
+    name: str
+    extension: Optional[str] = None
+    folder_id: Optional[int] = Field(
+        None, description="Containing folder; the parent folder for folders"
+    )
+    path: List[FolderCrumb] = Field(
+        ..., description="Ancestor folders from the root down"
+    )
+    created_at: datetime
+    updated_at: datetime
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_offset: Optional[int] = Field(
+        None, description="Pass as `offset` to fetch the next page"
+    )
@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SHA256_PATTERN = r"^[0-9a-fA-F]{64}$"
+
+
+class UploadSessionCreate(BaseModel):
+    folder_id: int = Field(..., description="Folder the file is uploaded into")
+    filename: str = Field(..., min_length=5, max_length=255, example="Report.pdf")
+    size: int = Field(..., gt=0, description="Total size of the file in bytes")
+    chunk_size: Optional[int] = Field(None, ge=MIN_CHUNK_SIZE, le=MAX_CHUNK_SIZE)
+    sha256: Optional[str] = Field(
+        None,
+        pattern=SHA256_PATTERN,
+        description="Checksum of the whole file, verified on completion",
+    )
+
+    @field_validator("filename")
+    @classmethod
+    def only_pdf(cls, filename: str) -> str:
+        if not filename.lower().endswith(".pdf"):
+            raise ValueError("Only PDF files are allowed")
+        return filename
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    folder_id: int
+    filename: str
+    size: int
+    chunk_size: int
+    chunk_count: int
+    status: str
+    received: List[int] = Field(..., description="Indexes of the stored chunks")
+    offset: int = Field(
+        ..., description="Bytes received contiguously from the start of the file"
+    )
+    file_id: Optional[int] = None
+    expires_at: datetime
+
+
+class UploadChunkResponse(BaseModel):
+    index: int
+    size: int
+    sha256: str
+
+    class Config:
+        from_attributes = True
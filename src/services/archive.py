@@ -0,0 +1,215 @@
+import logging
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+import aiofiles
+from sqlalchemy import Integer, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.responses import STREAM_CHUNK_SIZE
+from src.core.storage import blob_store
+from src.models.file import File
+from src.models.folder import Folder
+from src.services.folder import _in_subtree
+
+logger = logging.getLogger(__name__)
+
+# Earliest timestamp a zip entry can hold
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+@dataclass
+class FolderArchive:
+    """What is needed to stream a folder subtree as a zip.
+
+    Only folders are loaded up front; files are read in batches while the
+    archive is being sent.
+    """
+
+    name: str
+    path: str
+    # Entry name of every folder ("Root/Sub/"), parents first
+    directories: Dict[int, str] = field(default_factory=dict)
+    modified: Dict[int, datetime] = field(default_factory=dict)
+    # Names taken by subfolders, so files next to them don't reuse them
+    taken: Dict[int, Set[str]] = field(default_factory=dict)
+
+
+class _ZipBuffer:
+    """Write-only sink for ``ZipFile``.
+
+    It has no ``tell``, so zipfile treats it as unseekable and writes sizes
+    and CRCs after each entry's data instead of seeking back to the header.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArchiveService:
+    @staticmethod
+    async def prepare(db: AsyncSession, folder_id: int) -> Optional[FolderArchive]:
+        """Load the folders under ``folder_id``, or None when it doesn't exist."""
+        result = await db.execute(
+            select(Folder.name, Folder.path).where(Folder.id == folder_id)
+        )
+        root = result.first()
+        if root is None:
+            return None
+
+        archive = FolderArchive(name=root.name, path=root.path)
+        result = await db.execute(
+            select(Folder.id, Folder.parent_id, Folder.name, Folder.updated_at)
+            .where(_in_subtree(Folder.path, root.path))
+            .order_by(Folder.depth, Folder.name, Folder.id)
+        )
+        for row in result:
+            parent = archive.directories.get(row.parent_id, "")
+            siblings = archive.taken.setdefault(row.parent_id, set())
+            name = _unique_name(_safe_name(row.name), siblings)
+            archive.directories[row.id] = f"{parent}{name}/"
+            archive.modified[row.id] = row.updated_at
+        archive.taken.pop(None, None)
+        return archive
+
+    @staticmethod
+    async def stream(
+        archive: FolderArchive,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        """Yield the archive as a zip, one file chunk at a time.
+
+        Entries are stored uncompressed; PDFs barely compress and this keeps
+        the work per byte to a CRC. A connection is only held while a batch
+        of file rows is read, so files changed during a long download may or
+        may not be included. Folders added to the subtree meanwhile are not.
+        """
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        out = _ZipBuffer()
+        zip_file = zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED)
+
+        for folder_id, name in archive.directories.items():
+            zip_file.writestr(_directory_info(name, archive.modified[folder_id]), b"")
+        yield out.drain()
+
+        # Only the folders listed above; one created or moved into the
+        # subtree meanwhile has no entry to put its files under
+        folder_ids = list(archive.directories)
+        current_folder = None
+        used: Set[str] = set()
+        after: Optional[Tuple] = None
+        while True:
+            async with session_factory() as db:
+                rows = await _file_batch(db, folder_ids, after, batch_size)
+            for row in rows:
+                if row.folder_id != current_folder:
+                    current_folder = row.folder_id
+                    used = set(archive.taken.get(row.folder_id, ()))
+                filename = f"{row.name}.{row.extension}" if row.extension else row.name
+                name = _unique_name(_safe_name(filename), used)
+                entry = archive.directories[row.folder_id] + name
+                async for chunk in _write_blob(zip_file, out, entry, row):
+                    yield chunk
+            if len(rows) < batch_size:
+                break
+            last = rows[-1]
+            after = (last.folder_id, last.name, last.id)
+
+        zip_file.close()
+        yield out.drain()
+
+
+async def _file_batch(db: AsyncSession, folder_ids: List[int], after, batch_size: int):
+    query = (
+        select(
+            File.id,
+            File.folder_id,
+            File.name,
+            File.extension,
+            File.content_hash,
+            File.updated_at,
+        )
+        .where(
+            File.folder_id == func.any(literal(folder_ids, ARRAY(Integer))),
+            File.content_hash.is_not(None),
+        )
+        .order_by(File.folder_id, File.name, File.id)
+        .limit(batch_size)
+    )
+    if after is not None:
+        query = query.where(tuple_(File.folder_id, File.name, File.id) > after)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def _write_blob(
+    zip_file: zipfile.ZipFile, out: _ZipBuffer, entry: str, row
+) -> AsyncIterator[bytes]:
+    size = await blob_store.size(row.content_hash)
+    if size is None:
+        # The response has started, so a missing blob can't fail it anymore
+        logger.warning("Leaving file %s out of archive, blob missing", row.id)
+        return
+
+    info = zipfile.ZipInfo(entry, _zip_time(row.updated_at))
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    # Known up front so zipfile picks zip64 headers for large files
+    info.file_size = size
+    async with aiofiles.open(blob_store.path_for(row.content_hash), "rb") as blob:
+        with zip_file.open(info, "w") as writer:
+            while chunk := await blob.read(STREAM_CHUNK_SIZE):
+                writer.write(chunk)
+                yield out.drain()
+    yield out.drain()
+
+
+def _directory_info(name: str, modified: Optional[datetime]) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, _zip_time(modified))
+    info.external_attr = (0o40755 << 16) | 0x10
+    return info
+
+
+def _safe_name(name: str) -> str:
+    # Names become path components; keep them from nesting or escaping
+    name = name.replace("/", "_").replace("\\", "_").strip()
+    return "_" if name in ("", ".", "..") else name
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """``name``, or ``name (2)`` etc. when it is in ``used``; adds it there."""
+    candidate = name
+    stem, dot, extension = name.rpartition(".")
+    if not stem:
+        stem, dot, extension = name, "", ""
+    number = 1
+    while candidate.lower() in used:
+        number += 1
+        candidate = f"{stem} ({number}){dot}{extension}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def _zip_time(value: Optional[datetime]) -> Tuple[int, ...]:
+    if value is None:
+        return ZIP_EPOCH
+    return max(value.astimezone(timezone.utc).timetuple()[:6], ZIP_EPOCH)
@@ -0,0 +1,13 @@
+from typing import Iterable, List
+
+# Also the actions recorded in the change log
+CREATED = "created"
+MOVED = "moved"
+UPDATED = "updated"
+DELETED = "deleted"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+
+
+def bulk_results(ids: Iterable[int], done, status: str) -> List[dict]:
+    return [{"id": i, "status": status if i in done else NOT_FOUND} for i in ids]
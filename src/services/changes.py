@@ -0,0 +1,194 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import AsyncIterator, Callable, Optional
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.notifications import PgListener
+from src.core.periodic import PeriodicTask
+from src.core.responses import encode_json
+from src.models.change import ChangeLog
+from src.models.version import VersionCounter
+from src.services.version import (
+    CHANGE_CHANNEL,
+    TREE_SCOPE,
+    VersionService,
+    settled,
+)
+
+FILE = "file"
+FOLDER = "folder"
+
+
+def change(entity: str, action: str, entity_id: int, **data) -> dict:
+    """A change log entry, passed to ``VersionService.bump``.
+
+    ``action`` is one of the statuses in ``src.services.bulk``.
+    """
+    return {"entity": entity, "action": action, "entity_id": entity_id, "data": data}
+
+
+class ChangeService:
+
+    @staticmethod
+    async def list_since(db: AsyncSession, since: Optional[int], limit: int) -> dict:
+        """Changes committed after version ``since``, oldest first.
+
+        A version is never split across pages, so a page may hold a few more
+        than ``limit`` entries. ``reset`` means the log no longer reaches
+        back to ``since`` and the client has to reload its tree.
+        """
+        latest = await VersionService.settled_version(db)
+        if since is None:
+            since = latest
+
+        # Versions are transaction ids, so they have gaps; only pruning
+        # tells whether the log still holds everything after ``since``
+        pruned = await VersionService.pruned_version(db)
+        if since < pruned or since > latest:
+            return {
+                "items": [],
+                "latest_version": latest,
+                "next_since": latest,
+                "reset": True,
+            }
+
+        cutoff = (
+            select(ChangeLog.version)
+            .where(ChangeLog.version > since, ChangeLog.version <= latest)
+            .order_by(ChangeLog.version, ChangeLog.id)
+            .offset(limit - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(
+                ChangeLog.version,
+                ChangeLog.entity,
+                ChangeLog.action,
+                ChangeLog.entity_id,
+                ChangeLog.data,
+                ChangeLog.created_at,
+            )
+            .where(ChangeLog.version > since)
+            .where(ChangeLog.version <= func.coalesce(cutoff, latest))
+            .order_by(ChangeLog.version, ChangeLog.id)
+        )
+        items = [dict(row._mapping) for row in result]
+        return {
+            "items": items,
+            "latest_version": latest,
+            "next_since": items[-1]["version"] if items else since,
+            "reset": False,
+        }
+
+    @staticmethod
+    async def prune(db: AsyncSession, max_age: int) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        pruned = (
+            delete(ChangeLog)
+            .where(ChangeLog.created_at < cutoff, settled(ChangeLog.version))
+            .returning(ChangeLog.version, ChangeLog.created_at)
+            .cte("pruned")
+        )
+        # Remembers how far the log no longer reaches, and keeps the tree
+        # version from going back once the newest entries are pruned
+        raised = (
+            update(VersionCounter)
+            .where(VersionCounter.scope == TREE_SCOPE)
+            .values(
+                value=func.greatest(
+                    VersionCounter.value,
+                    select(func.max(pruned.c.version)).scalar_subquery(),
+                ),
+                updated_at=func.greatest(
+                    VersionCounter.updated_at,
+                    select(func.max(pruned.c.created_at)).scalar_subquery(),
+                ),
+            )
+            .cte("raised")
+        )
+        result = await db.execute(
+            select(func.count()).select_from(pruned).add_cte(raised)
+        )
+        await db.commit()
+        return result.scalar_one()
+
+
+class ChangeFeed:
+    """Pushes committed changes to Server-Sent Events streams.
+
+    Each process listens once on the change channel for all of its streams.
+    A notification only wakes them; every stream then reads what it missed
+    from the change log, so nothing is lost while a stream is busy or the
+    LISTEN connection reconnects. Idle streams hold no pooled connection.
+    A change committed while an older writer is still open is held back
+    until that one finishes, and then sent on the next wakeup or heartbeat.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        heartbeat: float,
+        batch_size: int,
+    ):
+        self.session_factory = session_factory
+        self.heartbeat = heartbeat
+        self.batch_size = batch_size
+        self._wakeup = asyncio.Event()
+
+    def attach(self, listener: PgListener) -> None:
+        listener.subscribe(CHANGE_CHANNEL, self.wake)
+        listener.on_reconnect(self.wake)
+
+    def wake(self, payload: Optional[str] = None) -> None:
+        # Streams wait on the event current when they last read the log, so
+        # a notification arriving mid-read still wakes them.
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def events(self, since: Optional[int]) -> AsyncIterator[bytes]:
+        """One ``change`` event per version, with the version as event id."""
+        while True:
+            wakeup = self._wakeup
+            async with self.session_factory() as db:
+                page = await ChangeService.list_since(db, since, self.batch_size)
+            since = page["next_since"]
+            if page["reset"]:
+                data = {"latest_version": page["latest_version"]}
+                yield _event("reset", since, data)
+            for version, entries in groupby(page["items"], lambda e: e["version"]):
+                yield _event("change", version, list(entries))
+            if len(page["items"]) >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+
+
+def _event(name: str, event_id: int, data) -> bytes:
+    return b"event: %s\nid: %d\ndata: %s\n\n" % (
+        name.encode(),
+        event_id,
+        encode_json(data),
+    )
+
+
+async def prune_change_log() -> int:
+    async with AsyncSessionLocal() as db:
+        return await ChangeService.prune(db, settings.CHANGE_LOG_RETENTION)
+
+
+change_feed = ChangeFeed(
+    AsyncSessionLocal,
+    heartbeat=settings.CHANGE_FEED_HEARTBEAT,
+    batch_size=settings.CHANGE_FEED_BATCH_SIZE,
+)
+change_log_pruner = PeriodicTask(prune_change_log, settings.CHANGE_LOG_PRUNE_INTERVAL)
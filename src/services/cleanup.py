@@ -0,0 +1,23 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.job import Job
+from src.services.file import RELEASE_BLOBS, FileService
+from src.services.job import JobService
+
+BATCH_SIZE = 200
+
+
+async def release_blobs(db: AsyncSession, job: Job) -> None:
+    """Delete stored PDFs and thumbnails that no file refers to any more.
+
+    Progress is committed after every batch, so a retried job carries on
+    where the previous attempt stopped. Releasing writes no rows; the
+    progress update comes last so the batch's transaction only holds an
+    id, which holds back the tree version, right before it commits.
+    """
+    content_hashes = job.payload["content_hashes"]
+    for start in range(job.progress, len(content_hashes), BATCH_SIZE):
+        batch = content_hashes[start : start + BATCH_SIZE]
+        await FileService.release_blobs(db, batch)
+        await JobService.set_progress(db, job.id, start + len(batch))
+        await db.commit()
@@ -1,31 +1,58 @@
-import os
-from typing import Optional, List
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, Optional, List, Tuple
 from fastapi import HTTPException, UploadFile
+from sqlalchemy import Integer, Text, delete, func, insert, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
 
+from src.core.pagination import decode_cursor, encode_cursor
+from src.core.storage import BlobRef, blob_store, thumbnail_store, upload_chunks
 from src.models.file import File as FileModel
-from src.models.folder import Folder
 from src.schemas.file import FileCreate, FileUpdate
+from src.services.job import JobService
+from src.services.processing import PROCESS_PDF
+from src.services.bulk import CREATED, DELETED, MOVED, UPDATED, bulk_results
+from src.services.changes import FILE, change
+from src.services.folder_stats import FolderStatsService, file_added, file_removed
+from src.services.tree_cache import tree_cache
+from src.services.version import VersionService
 
-UPLOAD_DIR = "uploads"
+# Largest value of the integer primary key
+MAX_ID = 2**31 - 1
+
+# Job kind; the handler is in src.services.cleanup
+RELEASE_BLOBS = "release_blobs"
+
+SORT_COLUMNS = {
+    "name": FileModel.name,
+    "created_at": FileModel.created_at,
+    "updated_at": FileModel.updated_at,
+}
 
 
 class FileService:
 
     @staticmethod
     async def create_file(db: AsyncSession, data: FileCreate) -> FileModel:
-        result = await db.execute(select(Folder).where(Folder.id == data.folder_id))
-        folder = result.scalars().first()
-        if not folder:
+        try:
+            result = await db.execute(
+                insert(FileModel)
+                .values(
+                    name=data.name, extension=data.extension, folder_id=data.folder_id
+                )
+                .returning(FileModel)
+            )
+        except IntegrityError:
+            await db.rollback()
             raise HTTPException(status_code=404, detail="Folder does not exist")
-
-        file = FileModel(
-            name=data.name, extension=data.extension, folder_id=data.folder_id
-        )
-        db.add(file)
+        file = result.scalars().one()
+        await FolderStatsService.apply(db, [file_added(file.folder_id, None)])
+        await tree_cache.invalidate_on_commit(db, [file.folder_id], files_only=True)
+        await VersionService.bump(db, [file.folder_id], [_created(file)])
         await db.commit()
-        await db.refresh(file)
         return file
 
     @staticmethod
@@ -33,69 +60,423 @@ class FileService:
         result = await db.execute(select(FileModel).where(FileModel.id == file_id))
         return result.scalars().first()
 
+    @staticmethod
+    async def get_file_content(
+        db: AsyncSession, file_id: int
+    ) -> Tuple[FileModel, str, int]:
+        """Return the file with the path and size of its stored blob."""
+        file = await FileService.get_file(db, file_id)
+        if not file:
+            raise HTTPException(status_code=404, detail="File not found")
+        if not file.content_hash:
+            raise HTTPException(status_code=404, detail="File has no stored content")
+
+        size = await blob_store.size(file.content_hash)
+        if size is None:
+            raise HTTPException(status_code=404, detail="File content is missing")
+        return file, blob_store.path_for(file.content_hash), size
+
+    @staticmethod
+    async def get_file_thumbnail(
+        db: AsyncSession, file_id: int
+    ) -> Tuple[FileModel, str, int]:
+        file = await FileService.get_file(db, file_id)
+        if not file:
+            raise HTTPException(status_code=404, detail="File not found")
+        size = None
+        if file.has_thumbnail:
+            size = await thumbnail_store.size(file.content_hash)
+        if size is None:
+            raise HTTPException(status_code=404, detail="File has no thumbnail")
+        return file, thumbnail_store.path_for(file.content_hash), size
+
     @staticmethod
     async def update_file(
         db: AsyncSession, file_id: int, data: FileUpdate
     ) -> Optional[FileModel]:
-        file = await FileService.get_file(db, file_id)
-        if not file:
-            return None
+        values = data.model_dump(exclude_none=True, include={"name", "folder_id"})
+        if not values:
+            return await FileService.get_file(db, file_id)
 
-        if data.name is not None:
-            file.name = data.name
-        if data.folder_id is not None:
-            file.folder_id = data.folder_id
+        # Self-join so RETURNING also reports the folder the file was in
+        previous = aliased(FileModel)
+        try:
+            result = await db.execute(
+                update(FileModel)
+                .where(FileModel.id == previous.id)
+                .where(FileModel.id == file_id)
+                .values(**values)
+                .returning(FileModel, previous.folder_id)
+                .execution_options(synchronize_session=False)
+            )
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Folder does not exist")
+        row = result.first()
+        if row is None:
+            return None
 
+        file, old_folder_id = row
+        if file.folder_id != old_folder_id:
+            deltas = [
+                file_removed(old_folder_id, file.size_bytes),
+                file_added(file.folder_id, file.size_bytes),
+            ]
+            await FolderStatsService.apply(db, deltas)
+            entry = change(
+                FILE,
+                MOVED,
+                file.id,
+                name=file.name,
+                folder_id=file.folder_id,
+                from_folder_id=old_folder_id,
+            )
+        else:
+            entry = change(FILE, UPDATED, file.id, name=file.name)
+        await tree_cache.invalidate_on_commit(
+            db, [old_folder_id, file.folder_id], files_only=True
+        )
+        await VersionService.bump(db, [old_folder_id, file.folder_id], [entry])
         await db.commit()
-        await db.refresh(file)
         return file
 
     @staticmethod
     async def delete_file(db: AsyncSession, file_id: int) -> bool:
-        file = await FileService.get_file(db, file_id)
-        if not file:
+        result = await db.execute(
+            delete(FileModel)
+            .where(FileModel.id == file_id)
+            .returning(
+                FileModel.folder_id, FileModel.content_hash, FileModel.size_bytes
+            )
+            .execution_options(synchronize_session=False)
+        )
+        file = result.first()
+        if file is None:
+            await db.rollback()
             return False
 
-        await db.delete(file)
+        removed = file_removed(file.folder_id, file.size_bytes)
+        await FolderStatsService.apply(db, [removed])
+        deleted = change(FILE, DELETED, file_id, folder_id=file.folder_id)
+        await tree_cache.invalidate_on_commit(db, [file.folder_id], files_only=True)
+        await VersionService.bump(db, [file.folder_id], [deleted])
         await db.commit()
+        await FileService.release_blobs(db, [file.content_hash])
         return True
 
     @staticmethod
-    async def get_files_in_folder(db: AsyncSession, folder_id: int) -> List[FileModel]:
-        result = await db.execute(
-            select(FileModel).where(FileModel.folder_id == folder_id)
-        )
-        return result.scalars().all()
+    async def get_files_in_folder(
+        db: AsyncSession,
+        folder_id: int,
+        sort: str = "name",
+        order: str = "asc",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> tuple[List[FileModel], Optional[str]]:
+        """Return one page of a folder's files ordered by ``(sort, id)``.
+
+        Pages are addressed by an opaque keyset cursor, so every page is a
+        single index range scan no matter how deep the client has scrolled.
+        """
+        sort_column = SORT_COLUMNS[sort]
+        descending = order == "desc"
+
+        statement = select(FileModel).where(FileModel.folder_id == folder_id)
+        if prefix:
+            statement = statement.where(
+                FileModel.name.startswith(prefix, autoescape=True)
+            )
+        if cursor:
+            cursor_sort, cursor_order, value, last_id = _decode_file_cursor(cursor)
+            if (cursor_sort, cursor_order) != (sort, order):
+                raise HTTPException(
+                    status_code=400, detail="Cursor does not match sort order"
+                )
+            key = tuple_(sort_column, FileModel.id)
+            statement = statement.where(
+                key < (value, last_id) if descending else key > (value, last_id)
+            )
+
+        if descending:
+            statement = statement.order_by(sort_column.desc(), FileModel.id.desc())
+        else:
+            statement = statement.order_by(sort_column, FileModel.id)
+
+        result = await db.execute(statement.limit(limit + 1))
+        files = result.scalars().all()
+
+        next_cursor = None
+        if len(files) > limit:
+            files = files[:limit]
+            last = files[-1]
+            next_cursor = encode_cursor([sort, order, getattr(last, sort), last.id])
+        return files, next_cursor
 
     @staticmethod
     async def upload_file(
         db: AsyncSession, folder_id: int, uploaded_file: UploadFile
     ) -> FileModel:
-        import aiofiles
-
-        result = await db.execute(select(Folder).where(Folder.id == folder_id))
-        folder = result.scalars().first()
-        if not folder:
-            raise HTTPException(status_code=404, detail="Folder does not exist")
-
         # Solo PDF
         if not uploaded_file.filename.lower().endswith(".pdf"):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        file_path = os.path.join(UPLOAD_DIR, uploaded_file.filename)
+        def store():
+            return blob_store.put(upload_chunks(uploaded_file))
 
-        async with aiofiles.open(file_path, "wb") as out_file:
-            content = await uploaded_file.read()
-            await out_file.write(content)
+        new_file = await FileService.add_stored_file(
+            db, folder_id, uploaded_file.filename[: -len(".pdf")], await store(), store
+        )
+        await db.commit()
+        return new_file
 
-        new_file = FileModel(
-            name=uploaded_file.filename.replace(".pdf", ""),
-            extension="pdf",
-            folder_id=folder_id,
+    @staticmethod
+    async def add_stored_file(
+        db: AsyncSession,
+        folder_id: int,
+        name: str,
+        blob: BlobRef,
+        store_again: Callable[[], Awaitable[BlobRef]],
+    ) -> FileModel:
+        """Add the row for an uploaded PDF to the current transaction.
+
+        ``store_again`` writes the blob once more in case a concurrent delete
+        released it before the blob lock was taken. A missing folder is a 404,
+        and the blob is released again.
+        """
+        await FileService._lock_blob(db, blob.sha256)
+        if not await blob_store.exists(blob.sha256):
+            blob = await store_again()
+
+        try:
+            result = await db.execute(
+                insert(FileModel)
+                .values(
+                    name=name,
+                    extension="pdf",
+                    folder_id=folder_id,
+                    content_hash=blob.sha256,
+                    size_bytes=blob.size,
+                )
+                .returning(FileModel)
+            )
+        except IntegrityError:
+            await db.rollback()
+            await FileService.release_blobs(db, [blob.sha256])
+            raise HTTPException(status_code=404, detail="Folder does not exist")
+        new_file = result.scalars().one()
+        await FolderStatsService.apply(db, [file_added(folder_id, blob.size)])
+        # Page count, text and thumbnail are filled in off the request path
+        await JobService.enqueue(db, PROCESS_PDF, file_id=new_file.id)
+        await tree_cache.invalidate_on_commit(db, [folder_id], files_only=True)
+        await VersionService.bump(db, [folder_id], [_created(new_file)])
+        return new_file
+
+    @staticmethod
+    async def bulk_move(
+        db: AsyncSession, file_ids: List[int], folder_id: int
+    ) -> List[dict]:
+        file_ids = sorted(set(file_ids))
+        # Self-join so RETURNING can report the folder each file came from
+        previous = aliased(FileModel)
+        try:
+            result = await db.execute(
+                update(FileModel)
+                .where(FileModel.id == previous.id)
+                .where(FileModel.id.in_(file_ids))
+                .values(folder_id=folder_id)
+                .returning(FileModel.id, previous.folder_id, FileModel.size_bytes)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            moved = {row.id: row.folder_id for row in rows}
+            if moved:
+                deltas = [
+                    delta
+                    for row in rows
+                    for delta in (
+                        file_removed(row.folder_id, row.size_bytes),
+                        file_added(folder_id, row.size_bytes),
+                    )
+                ]
+                await FolderStatsService.apply(db, deltas)
+                affected = [folder_id, *moved.values()]
+                changes = [
+                    change(
+                        FILE,
+                        MOVED,
+                        file_id,
+                        folder_id=folder_id,
+                        from_folder_id=from_folder_id,
+                    )
+                    for file_id, from_folder_id in moved.items()
+                ]
+                await tree_cache.invalidate_on_commit(db, affected, files_only=True)
+                await VersionService.bump(db, affected, changes)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Folder does not exist")
+        return bulk_results(file_ids, moved, MOVED)
+
+    @staticmethod
+    async def bulk_rename(db: AsyncSession, items: List[dict]) -> List[dict]:
+        renames = {item["id"]: item["name"] for item in items}
+        values = (
+            func.unnest(
+                literal(list(renames), ARRAY(Integer)),
+                literal(list(renames.values()), ARRAY(Text)),
+            )
+            .table_valued("id", "name")
+            .render_derived()
         )
+        result = await db.execute(
+            update(FileModel)
+            .where(FileModel.id == values.c.id)
+            .values(name=values.c.name)
+            .returning(FileModel.id, FileModel.folder_id)
+            .execution_options(synchronize_session=False)
+        )
+        renamed = dict(result.all())
+        if renamed:
+            changes = [
+                change(FILE, UPDATED, file_id, name=renames[file_id])
+                for file_id in renamed
+            ]
+            await tree_cache.invalidate_on_commit(db, renamed.values(), files_only=True)
+            await VersionService.bump(db, renamed.values(), changes)
+        await db.commit()
+        return bulk_results(renames, renamed, UPDATED)
 
-        db.add(new_file)
+    @staticmethod
+    async def bulk_delete(
+        db: AsyncSession, file_ids: List[int]
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Delete the files; their stored content goes in a background job.
+
+        Returns the per-id results and that job's id, if there was any.
+        """
+        file_ids = sorted(set(file_ids))
+        result = await db.execute(
+            delete(FileModel)
+            .where(FileModel.id.in_(file_ids))
+            .returning(
+                FileModel.id,
+                FileModel.folder_id,
+                FileModel.content_hash,
+                FileModel.size_bytes,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        deleted = {row.id for row in rows}
+        job_id = None
+        if rows:
+            removed = [file_removed(row.folder_id, row.size_bytes) for row in rows]
+            await FolderStatsService.apply(db, removed)
+            content_hashes = sorted(
+                {row.content_hash for row in rows if row.content_hash}
+            )
+            if content_hashes:
+                job_id = await JobService.enqueue(
+                    db,
+                    RELEASE_BLOBS,
+                    payload={"content_hashes": content_hashes},
+                    total=len(content_hashes),
+                )
+            affected = [row.folder_id for row in rows]
+            changes = [
+                change(FILE, DELETED, row.id, folder_id=row.folder_id) for row in rows
+            ]
+            await tree_cache.invalidate_on_commit(db, affected, files_only=True)
+            await VersionService.bump(db, affected, changes)
         await db.commit()
-        await db.refresh(new_file)
-        return new_file
+        return bulk_results(file_ids, deleted, DELETED), job_id
+
+    @staticmethod
+    async def _lock_blob(db: AsyncSession, content_hash: str) -> None:
+        # Serializes "last reference gone" checks against uploads of the same
+        # bytes; released when the surrounding transaction ends.
+        await db.execute(
+            select(func.pg_advisory_xact_lock(func.hashtextextended(content_hash, 0)))
+        )
+
+    @staticmethod
+    async def lock_blobs(db: AsyncSession, content_hashes: Iterable[str]) -> None:
+        """``_lock_blob`` for many hashes in one statement.
+
+        The array is sorted, and unnest returns it in order, so the locks
+        are taken in the same order as ``release_blobs`` takes them.
+        """
+        content_hashes = sorted(set(content_hashes))
+        if not content_hashes:
+            return
+        keys = (
+            func.unnest(literal(content_hashes, ARRAY(Text)))
+            .table_valued("content_hash")
+            .render_derived()
+        )
+        key = func.hashtextextended(keys.c.content_hash, 0)
+        await db.execute(select(func.pg_advisory_xact_lock(key)))
+
+    @staticmethod
+    async def release_blobs(
+        db: AsyncSession, content_hashes: Iterable[Optional[str]]
+    ) -> None:
+        """Delete the stored content no file refers to any more.
+
+        Two statements however many hashes: one takes all their locks, one
+        finds those still referenced.
+        """
+        content_hashes = sorted({h for h in content_hashes if h})
+        if content_hashes:
+            await FileService.lock_blobs(db, content_hashes)
+            result = await db.execute(
+                select(FileModel.content_hash)
+                .where(FileModel.content_hash.in_(content_hashes))
+                .group_by(FileModel.content_hash)
+            )
+            referenced = set(result.scalars())
+            for content_hash in content_hashes:
+                if content_hash not in referenced:
+                    await blob_store.delete(content_hash)
+                    await thumbnail_store.delete(content_hash)
+        await db.commit()
+
+
+def _created(file: FileModel) -> dict:
+    return change(
+        FILE,
+        CREATED,
+        file.id,
+        name=file.name,
+        extension=file.extension,
+        folder_id=file.folder_id,
+    )
+
+
+def _decode_file_cursor(cursor: str) -> list:
+    """``[sort, order, value, last_id]``, with timestamps parsed.
+
+    Cursors come back from clients, so anything that doesn't look like one
+    of ours is a 400 rather than a failing query.
+    """
+    values = decode_cursor(cursor)
+    invalid = HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != 4:
+        raise invalid
+    sort, order, value, last_id = values
+    if not isinstance(sort, str) or sort not in SORT_COLUMNS:
+        raise invalid
+    if order not in ("asc", "desc") or not isinstance(value, str):
+        raise invalid
+    if type(last_id) is not int or not 0 < last_id <= MAX_ID:
+        raise invalid
+    if sort != "name":
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise invalid
+        if value.tzinfo is None:
+            raise invalid
+    return [sort, order, value, last_id]
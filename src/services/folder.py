@@ -1,20 +1,86 @@
-from typing import Optional, List
+from typing import NamedTuple, Optional, List
+from fastapi import HTTPException
+from sqlalchemy import (
+    Integer,
+    Text,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    not_,
+    null,
+    or_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
+from src.models.file import File
 from src.models.folder import Folder
 from src.schemas.folder import FolderCreate, FolderUpdate
+from src.services.bulk import (
+    CREATED,
+    DELETED,
+    INVALID,
+    MOVED,
+    NOT_FOUND,
+    UPDATED,
+    bulk_results,
+)
+from src.services.changes import FOLDER, change
+from src.services.cleanup import RELEASE_BLOBS
+from src.services.folder_stats import FolderStatsService, StatsDelta
+from src.services.job import JobService
+from src.services.tree_cache import tree_cache
+from src.services.version import VersionService
 
 
 class FolderService:
 
     @staticmethod
     async def create_folder(db: AsyncSession, data: FolderCreate) -> Folder:
-        folder = Folder(name=data.name, parent_id=data.parent_id)
-        db.add(folder)
-        await db.commit()
-        await db.refresh(folder)
+        # The id is drawn up front so the row is inserted with its final path.
+        new_id = select(
+            func.nextval(func.pg_get_serial_sequence("folders", "id")).label("id")
+        ).cte("new_id")
+        parent = aliased(Folder)
+        source = (
+            select(
+                new_id.c.id,
+                literal(data.name, Text),
+                literal(data.parent_id, Integer),
+                func.coalesce(parent.path, "/") + cast(new_id.c.id, Text) + "/",
+                func.coalesce(parent.depth + 1, 0),
+            )
+            .select_from(new_id)
+            .outerjoin(parent, parent.id == data.parent_id)
+        )
+        statement = (
+            insert(Folder)
+            .from_select(["id", "name", "parent_id", "path", "depth"], source)
+            .returning(Folder)
+        )
+        try:
+            result = await db.execute(statement)
+            folder = result.scalars().one()
+            added = StatsDelta(data.parent_id, folders=1, direct_folders=1)
+            await FolderStatsService.apply(db, [added])
+            created = change(
+                FOLDER, CREATED, folder.id, name=folder.name, parent_id=folder.parent_id
+            )
+            await tree_cache.invalidate_on_commit(db, [data.parent_id])
+            await VersionService.bump(db, changes=[created])
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Parent folder does not exist")
         return folder
 
     @staticmethod
@@ -35,67 +101,644 @@ class FolderService:
     async def update_folder(
         db: AsyncSession, folder_id: int, data: FolderUpdate
     ) -> Optional[Folder]:
-        folder = await FolderService.get_folder(db, folder_id)
-        if not folder:
-            return None
+        if data.parent_id is None and data.name is None:
+            return await FolderService.get_folder(db, folder_id)
 
-        if data.name is not None:
-            folder.name = data.name
+        affected = [folder_id]
+        from_parent_id = None
         if data.parent_id is not None:
-            folder.parent_id = data.parent_id
+            moved = await FolderService._move(db, folder_id, data.parent_id)
+            if not moved:
+                return None
+            folder, _, from_parent_id = moved
+            affected.append(data.parent_id)
+        if data.name is not None:
+            result = await db.execute(
+                update(Folder)
+                .where(Folder.id == folder_id)
+                .values(name=data.name)
+                .returning(Folder)
+                .execution_options(populate_existing=True)
+            )
+            folder = result.scalars().first()
+            if not folder:
+                return None
 
+        if data.parent_id is not None and from_parent_id != data.parent_id:
+            entry = change(
+                FOLDER,
+                MOVED,
+                folder_id,
+                name=folder.name,
+                parent_id=folder.parent_id,
+                from_parent_id=from_parent_id,
+            )
+        else:
+            entry = change(FOLDER, UPDATED, folder_id, name=folder.name)
+        await tree_cache.invalidate_on_commit(db, affected)
+        await VersionService.bump(db, changes=[entry])
         await db.commit()
-        await db.refresh(folder)
         return folder
 
     @staticmethod
-    async def delete_folder(db: AsyncSession, folder_id: int) -> bool:
-        folder = await FolderService.get_folder(db, folder_id)
-        if not folder:
-            return False
+    async def delete_folder(
+        db: AsyncSession, folder_id: int
+    ) -> tuple[bool, Optional[int]]:
+        """Delete a folder with its subtree; returns the blob cleanup job id."""
+        deleted, job_id = await FolderService._delete_subtrees(db, [folder_id])
+        if not deleted:
+            await db.rollback()
+            return False, None
+        # The subtree goes with it; clients drop everything below the folder
+        entry = change(FOLDER, DELETED, folder_id, parent_id=deleted[folder_id])
+        await tree_cache.invalidate_on_commit(db, [folder_id])
+        await VersionService.bump(db, changes=[entry])
+        await db.commit()
+        return True, job_id
 
-        await db.delete(folder)
+    @staticmethod
+    async def move_folder(
+        db: AsyncSession, folder_id: int, parent_id: Optional[int]
+    ) -> Optional[tuple[Folder, list]]:
+        moved = await FolderService._move(db, folder_id, parent_id)
+        if not moved:
+            return None
+        folder, ancestors, from_parent_id = moved
+        entry = change(
+            FOLDER,
+            MOVED,
+            folder_id,
+            parent_id=parent_id,
+            from_parent_id=from_parent_id,
+        )
+        await tree_cache.invalidate_on_commit(db, [folder_id, parent_id])
+        await VersionService.bump(db, changes=[entry])
         await db.commit()
-        return True
+        return folder, ancestors
 
     @staticmethod
-    async def get_folder_tree(db: AsyncSession, folder_id: Optional[int] = None):
-        result = await db.execute(select(Folder).options(selectinload(Folder.files)))
-        all_folders = result.scalars().all()
+    async def _move(
+        db: AsyncSession, folder_id: int, parent_id: Optional[int]
+    ) -> Optional[tuple[Folder, list, Optional[int]]]:
+        outcome = await FolderService._move_many(db, [folder_id], parent_id)
+        status = outcome.statuses[folder_id]
+        if status == NOT_FOUND:
+            return None
+        if status == INVALID:
+            await db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail="A folder cannot be moved into itself or one of its subfolders",
+            )
+        return (
+            outcome.folders[folder_id],
+            outcome.ancestors,
+            outcome.previous_parents[folder_id],
+        )
 
-        folder_map = {f.id: f for f in all_folders}
-        for f in all_folders:
-            f.children = []
+    @staticmethod
+    async def _move_many(
+        db: AsyncSession, folder_ids: List[int], parent_id: Optional[int]
+    ) -> "MoveOutcome":
+        """Move folders (and their subtrees) under ``parent_id``, or to the root.
+
+        Only the moved folders and the target are locked up front, in id
+        order, which keeps their paths fixed for the cycle check and the
+        rewrite. Their ancestors are just read; ``FolderStatsService.apply``
+        locks the ones whose stats change near the end, and the root row of
+        each tree involved stays locked from there until the commit, as for
+        any other write in those trees. Folders nested inside another moved
+        folder still become direct children of the target.
+        """
+        folder_ids = sorted(set(folder_ids))
+        lock_ids = folder_ids if parent_id is None else [*folder_ids, parent_id]
+        columns = [
+            Folder.id,
+            Folder.name,
+            Folder.parent_id,
+            Folder.path,
+            Folder.depth,
+            Folder.total_file_count,
+            Folder.total_bytes,
+            Folder.total_folder_count,
+        ]
+        locked = (
+            select(*columns, literal(True).label("locked"))
+            .where(Folder.id.in_(lock_ids))
+            .order_by(Folder.id)
+            .with_for_update(key_share=True)
+            .cte("locked")
+        )
+        target_path = (
+            select(locked.c.path).where(locked.c.id == parent_id).scalar_subquery()
+        )
+        # Breadcrumbs of the target, read in the same statement
+        chain = select(*columns, literal(False)).where(
+            Folder.id == func.any(_path_ids_sql(target_path))
+        )
+        result = await db.execute(union_all(select(locked), chain))
+        rows = {}
+        for row in result.all():
+            if row.locked or row.id not in rows:
+                rows[row.id] = row
+        sources = {i: rows[i] for i in folder_ids if i in rows and rows[i].locked}
+        paths = {i: row.path for i, row in sources.items()}
+        if not paths:
+            return MoveOutcome({i: NOT_FOUND for i in folder_ids}, {}, [], {})
+
+        parent = rows.get(parent_id) if parent_id is not None else None
+        if parent_id is not None and (parent is None or not parent.locked):
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Parent folder does not exist")
 
-        tree = []
-        for f in all_folders:
-            if f.parent_id and f.parent_id in folder_map:
-                folder_map[f.parent_id].children.append(f)
+        statuses = {}
+        for folder_id in folder_ids:
+            path = paths.get(folder_id)
+            if path is None:
+                statuses[folder_id] = NOT_FOUND
+            elif parent is not None and parent.path.startswith(path):
+                statuses[folder_id] = INVALID
             else:
-                tree.append(f)
-
-        if folder_id:
-            tree = [f for f in tree if f.id == folder_id]
-
-        def build_tree(f: Folder):
-            return {
-                "id": f.id,
-                "name": f.name,
-                "parent_id": f.parent_id,
-                "created_at": f.created_at,
-                "updated_at": f.updated_at,
-                "files": [
+                statuses[folder_id] = MOVED
+        ancestors = []
+        if parent is not None:
+            # Missing when the target moved under a folder created after the
+            # statement's snapshot
+            if not set(_path_ids(parent.path)) <= rows.keys():
+                await db.rollback()
+                raise HTTPException(
+                    status_code=409, detail="Folder hierarchy changed, please retry"
+                )
+            ancestors = [rows[i] for i in _path_ids(parent.path)]
+        valid_ids = [i for i, status in statuses.items() if status == MOVED]
+        if not valid_ids:
+            return MoveOutcome(statuses, {}, ancestors, {})
+        previous_parents = {i: ([None] + _path_ids(paths[i]))[-2] for i in valid_ids}
+        await FolderStatsService.apply(
+            db, _move_deltas(sources, valid_ids, previous_parents, parent_id)
+        )
+
+        # Rewrite the path prefix of every moved subtree in one statement.
+        # Each descendant is rebased on its deepest moved ancestor, and only
+        # the moved roots get a new parent_id and updated_at.
+        new_prefix = parent.path if parent is not None else "/"
+        new_depth = parent.depth + 1 if parent is not None else 0
+        roots = (
+            select(Folder.id, Folder.path, Folder.depth)
+            .where(Folder.id.in_(valid_ids))
+            .cte("roots")
+        )
+        rewrite = (
+            select(
+                Folder.id,
+                (
+                    literal(new_prefix)
+                    + func.substr(
+                        Folder.path,
+                        func.length(roots.c.path) - func.length(cast(roots.c.id, Text)),
+                    )
+                ).label("path"),
+                (Folder.depth - roots.c.depth + new_depth).label("depth"),
+                (Folder.id == roots.c.id).label("is_root"),
+            )
+            .join(roots, _in_subtree(Folder.path, roots.c.path))
+            .distinct(Folder.id)
+            .order_by(Folder.id, roots.c.depth.desc())
+            .cte("rewrite")
+        )
+        moved = (
+            update(Folder)
+            .where(Folder.id == rewrite.c.id)
+            .values(
+                path=rewrite.c.path,
+                depth=rewrite.c.depth,
+                parent_id=case(
+                    (rewrite.c.is_root, literal(parent_id, Integer)),
+                    else_=Folder.parent_id,
+                ),
+                updated_at=case(
+                    (rewrite.c.is_root, func.now()), else_=Folder.updated_at
+                ),
+            )
+            .returning(*Folder.__table__.c)
+            .cte("moved")
+        )
+        moved_folder = aliased(Folder, moved)
+        result = await db.execute(
+            select(moved_folder)
+            .where(moved_folder.id.in_(valid_ids))
+            .execution_options(populate_existing=True)
+        )
+        folders = {folder.id: folder for folder in result.scalars()}
+        return MoveOutcome(statuses, folders, ancestors, previous_parents)
+
+    @staticmethod
+    async def bulk_move(
+        db: AsyncSession, folder_ids: List[int], parent_id: Optional[int]
+    ) -> List[dict]:
+        outcome = await FolderService._move_many(db, folder_ids, parent_id)
+        if outcome.folders:
+            changes = [
+                change(
+                    FOLDER,
+                    MOVED,
+                    folder_id,
+                    parent_id=parent_id,
+                    from_parent_id=outcome.previous_parents[folder_id],
+                )
+                for folder_id in outcome.folders
+            ]
+            await tree_cache.invalidate_on_commit(db, [*outcome.folders, parent_id])
+            await VersionService.bump(db, changes=changes)
+        await db.commit()
+        return [
+            {"id": folder_id, "status": status}
+            for folder_id, status in outcome.statuses.items()
+        ]
+
+    @staticmethod
+    async def bulk_rename(db: AsyncSession, items: List[dict]) -> List[dict]:
+        renames = {item["id"]: item["name"] for item in items}
+        values = (
+            func.unnest(
+                literal(list(renames), ARRAY(Integer)),
+                literal(list(renames.values()), ARRAY(Text)),
+            )
+            .table_valued("id", "name")
+            .render_derived()
+        )
+        result = await db.execute(
+            update(Folder)
+            .where(Folder.id == values.c.id)
+            .values(name=values.c.name)
+            .returning(Folder.id)
+            .execution_options(synchronize_session=False)
+        )
+        renamed = set(result.scalars())
+        if renamed:
+            changes = [
+                change(FOLDER, UPDATED, folder_id, name=renames[folder_id])
+                for folder_id in renamed
+            ]
+            await tree_cache.invalidate_on_commit(db, renamed)
+            await VersionService.bump(db, changes=changes)
+        await db.commit()
+        return bulk_results(renames, renamed, UPDATED)
+
+    @staticmethod
+    async def bulk_delete(
+        db: AsyncSession, folder_ids: List[int]
+    ) -> tuple[List[dict], Optional[int]]:
+        folder_ids = sorted(set(folder_ids))
+        deleted, job_id = await FolderService._delete_subtrees(db, folder_ids)
+        if deleted:
+            changes = [
+                change(FOLDER, DELETED, folder_id, parent_id=parent_id)
+                for folder_id, parent_id in deleted.items()
+            ]
+            await tree_cache.invalidate_on_commit(db, deleted)
+            await VersionService.bump(db, changes=changes)
+        await db.commit()
+        return bulk_results(folder_ids, deleted, DELETED), job_id
+
+    @staticmethod
+    async def _delete_subtrees(
+        db: AsyncSession, folder_ids: List[int]
+    ) -> tuple[dict[int, Optional[int]], Optional[int]]:
+        """Delete folders and everything below them in a fixed number of
+        statements, however big the subtrees are.
+
+        The subtrees are locked first so no file can be added to them
+        meanwhile. Their files are deleted returning the blobs they used,
+        then deleting the folders lets ON DELETE CASCADE remove the
+        subfolders. The blobs are released by a background job. Returns the
+        deleted folders with their parent ids, and the job id.
+        """
+        roots = aliased(Folder)
+        subtree = (
+            select(Folder.id)
+            .join(roots, _in_subtree(Folder.path, roots.path))
+            .where(roots.id.in_(folder_ids))
+        )
+        await db.execute(subtree.order_by(Folder.id).with_for_update(of=Folder))
+        result = await db.execute(
+            delete(File)
+            .where(File.folder_id.in_(subtree))
+            .returning(File.content_hash)
+            .execution_options(synchronize_session=False)
+        )
+        content_hashes = sorted({h for h in result.scalars() if h})
+
+        result = await db.execute(
+            delete(Folder)
+            .where(Folder.id.in_(folder_ids))
+            .returning(
+                Folder.id,
+                Folder.parent_id,
+                Folder.path,
+                Folder.total_file_count,
+                Folder.total_bytes,
+                Folder.total_folder_count,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        deleted = {row.id: row.parent_id for row in rows}
+        # Folders inside another deleted one are already in its totals
+        removed = [
+            StatsDelta(
+                row.parent_id,
+                files=-row.total_file_count,
+                bytes=-row.total_bytes,
+                folders=-row.total_folder_count - 1,
+                direct_folders=-1,
+            )
+            for row in rows
+            if not deleted.keys() & set(_path_ids(row.path)[:-1])
+        ]
+        await FolderStatsService.apply(db, removed)
+
+        job_id = None
+        if content_hashes:
+            job_id = await JobService.enqueue(
+                db,
+                RELEASE_BLOBS,
+                payload={"content_hashes": content_hashes},
+                total=len(content_hashes),
+            )
+        return deleted, job_id
+
+    @staticmethod
+    async def get_breadcrumbs(db: AsyncSession, folder_id: int) -> List[Folder]:
+        # The folder's own path lists its ancestors, so they are fetched by
+        # primary key in a single statement.
+        target = aliased(Folder)
+        result = await db.execute(
+            select(Folder)
+            .join(target, Folder.id == func.any(_path_ids_sql(target.path)))
+            .where(target.id == folder_id)
+            .order_by(Folder.depth)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_descendants(db: AsyncSession, folder_id: int) -> Optional[dict]:
+        result = await db.execute(
+            select(Folder.total_folder_count, Folder.total_file_count).where(
+                Folder.id == folder_id
+            )
+        )
+        counts = result.first()
+        if counts is None:
+            return None
+        return {
+            "folder_count": counts.total_folder_count,
+            "file_count": counts.total_file_count,
+        }
+
+    @staticmethod
+    async def get_root_nodes(db: AsyncSession) -> List[dict]:
+        result = await db.execute(
+            select(*_node_columns())
+            .where(Folder.parent_id.is_(None))
+            .order_by(Folder.name, Folder.id)
+        )
+        return [_node(row) for row in result.all()]
+
+    @staticmethod
+    async def get_children(
+        db: AsyncSession, folder_ids: List[int], include_files: bool = True
+    ) -> List[dict]:
+        """One level below each folder: subfolders with their counts, and files.
+
+        Returned in the order of ``folder_ids``; ids that don't exist are left
+        out. Each level costs the same two queries however many are asked for.
+        """
+        folder_ids = list(dict.fromkeys(folder_ids))
+        result = await db.execute(select(Folder.id).where(Folder.id.in_(folder_ids)))
+        found = set(result.scalars())
+        levels = {
+            folder_id: {"id": folder_id, "folders": [], "files": []}
+            for folder_id in folder_ids
+            if folder_id in found
+        }
+        if not levels:
+            return []
+
+        result = await db.execute(
+            select(*_node_columns())
+            .where(Folder.parent_id.in_(levels))
+            .order_by(Folder.parent_id, Folder.name, Folder.id)
+        )
+        for row in result.all():
+            levels[row.parent_id]["folders"].append(_node(row))
+
+        if include_files:
+            result = await db.execute(
+                select(
+                    File.id, File.name, File.extension, File.created_at, File.folder_id
+                )
+                .where(File.folder_id.in_(levels))
+                .order_by(File.folder_id, File.name, File.id)
+            )
+            for row in result.all():
+                levels[row.folder_id]["files"].append(
                     {
-                        "id": file.id,
-                        "name": file.name,
-                        "extension": file.extension,
-                        "created_at": file.created_at,
+                        "id": row.id,
+                        "name": row.name,
+                        "extension": row.extension,
+                        "created_at": row.created_at,
                     }
-                    for file in f.files
-                ],
-                "subfolders": [
-                    build_tree(child) for child in getattr(f, "children", [])
-                ],
-            }
-
-        return [build_tree(f) for f in tree]
+                )
+        return list(levels.values())
+
+    @staticmethod
+    async def get_folder_tree(
+        db: AsyncSession,
+        folder_id: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        include_files: bool = True,
+    ) -> List[dict]:
+        """Return the forest (or the subtree rooted at ``folder_id``) as nested dicts.
+
+        Folders and files are fetched with a single recursive query scoped to
+        the requested subtree; ``max_depth`` counts levels below the root(s).
+        """
+        anchor = select(
+            Folder.id,
+            Folder.name,
+            Folder.parent_id,
+            Folder.created_at,
+            Folder.updated_at,
+            literal(0).label("depth"),
+            array([Folder.id]).label("trail"),
+        )
+        if folder_id is None:
+            anchor = anchor.where(Folder.parent_id.is_(None))
+        else:
+            anchor = anchor.where(Folder.id == folder_id)
+        tree = anchor.cte("tree", recursive=True)
+
+        children = (
+            select(
+                Folder.id,
+                Folder.name,
+                Folder.parent_id,
+                Folder.created_at,
+                Folder.updated_at,
+                (tree.c.depth + 1).label("depth"),
+                tree.c.trail.op("||")(Folder.id).label("trail"),
+            ).join(tree, Folder.parent_id == tree.c.id)
+            # Guards against cycles left behind by unchecked moves
+            .where(not_(Folder.id == func.any(tree.c.trail)))
+        )
+        if max_depth is not None:
+            children = children.where(tree.c.depth < max_depth)
+        tree = tree.union_all(children)
+
+        folder_rows = select(
+            literal("folder").label("kind"),
+            tree.c.id,
+            tree.c.name,
+            tree.c.parent_id,
+            null().label("extension"),
+            tree.c.created_at,
+            tree.c.updated_at,
+            tree.c.depth,
+        )
+        statement = folder_rows
+        if include_files:
+            file_rows = select(
+                literal("file").label("kind"),
+                File.id,
+                File.name,
+                File.folder_id,
+                File.extension,
+                File.created_at,
+                File.updated_at,
+                literal(None, Integer).label("depth"),
+            ).join(tree, File.folder_id == tree.c.id)
+            statement = union_all(folder_rows, file_rows)
+        statement = statement.order_by("kind", "depth", "id")
+
+        result = await db.execute(statement)
+        return _assemble_tree(result.all())
+
+
+class MoveOutcome(NamedTuple):
+    statuses: dict[int, str]
+    folders: dict[int, Folder]
+    ancestors: list
+    previous_parents: dict[int, Optional[int]]
+
+
+def _in_subtree(column, path):
+    # Prefix match written as a range so the text_pattern_ops index is used
+    # even when the prefix is a bound parameter or comes from another row.
+    # Paths only hold digits and "/", and "0" sorts right after "/".
+    if isinstance(path, str):
+        upper = path[:-1] + "0"
+    else:
+        upper = (func.left(path, -1) + "0").self_group()
+    return and_(
+        column.op("~>=~", is_comparison=True)(path),
+        column.op("~<~", is_comparison=True)(upper),
+    )
+
+
+def _node_columns():
+    return (
+        Folder.id,
+        Folder.name,
+        Folder.parent_id,
+        Folder.created_at,
+        Folder.updated_at,
+        Folder.subfolder_count.label("child_folder_count"),
+        Folder.file_count,
+        Folder.total_folder_count,
+        Folder.total_file_count,
+        Folder.total_bytes,
+    )
+
+
+def _node(row) -> dict:
+    node = dict(row._mapping)
+    node["has_children"] = bool(node["child_folder_count"] or node["file_count"])
+    return node
+
+
+def _path_ids(path: str) -> List[int]:
+    return [int(part) for part in path.strip("/").split("/")]
+
+
+def _path_ids_sql(path):
+    return cast(func.string_to_array(func.trim(path, "/"), "/"), ARRAY(Integer))
+
+
+def _move_deltas(sources: dict, moved_ids, previous_parents: dict, parent_id):
+    """Stats deltas for moving ``moved_ids`` under ``parent_id``.
+
+    A moved folder nested inside another one leaves it, so it is taken out
+    of that folder's totals before those are carried over.
+    """
+    moved = set(moved_ids)
+    carried = {
+        i: [
+            sources[i].total_file_count,
+            sources[i].total_bytes,
+            sources[i].total_folder_count + 1,
+        ]
+        for i in moved_ids
+    }
+    for i in moved_ids:
+        outer = [a for a in _path_ids(sources[i].path)[:-1] if a in moved]
+        if outer:
+            totals = carried[outer[-1]]
+            totals[0] -= sources[i].total_file_count
+            totals[1] -= sources[i].total_bytes
+            totals[2] -= sources[i].total_folder_count + 1
+
+    deltas = []
+    for i in moved_ids:
+        files, size, folders = carried[i]
+        deltas.append(StatsDelta(previous_parents[i], -files, -size, -folders, 0, -1))
+        deltas.append(StatsDelta(parent_id, files, size, folders, 0, 1))
+    return deltas
+
+
+def _assemble_tree(rows) -> List[dict]:
+    # Rows arrive as files first (kind "file" < "folder") and then folders
+    # ordered by depth, so every parent is registered before its children.
+    files_by_folder: dict[int, list[dict]] = {}
+    folders: dict[int, dict] = {}
+    roots: list[dict] = []
+
+    for row in rows:
+        if row.kind == "file":
+            files_by_folder.setdefault(row.parent_id, []).append(
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "extension": row.extension,
+                    "created_at": row.created_at,
+                }
+            )
+            continue
+
+        node = {
+            "id": row.id,
+            "name": row.name,
+            "parent_id": row.parent_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "files": files_by_folder.get(row.id, []),
+            "subfolders": [],
+        }
+        folders[row.id] = node
+        parent = folders.get(row.parent_id) if row.depth else None
+        if parent is not None:
+            parent["subfolders"].append(node)
+        else:
+            roots.append(node)
+
+    return roots
@@ -0,0 +1,307 @@
+from typing import Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    Text,
+    case,
+    cast,
+    func,
+    literal,
+    or_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from src.core.storage import blob_store
+from src.models.file import File
+from src.models.folder import Folder
+from src.models.job import Job
+from src.services.job import JobService
+
+REPAIR_FOLDER_STATS = "repair_folder_stats"
+
+
+class StatsDelta(NamedTuple):
+    """A change to the stats of ``folder_id`` and all of its ancestors.
+
+    ``files``, ``bytes`` and ``folders`` apply to the totals of the folder
+    and every ancestor, the ``direct_*`` counts to the folder alone.
+    """
+
+    folder_id: Optional[int]
+    files: int = 0
+    bytes: int = 0
+    folders: int = 0
+    direct_files: int = 0
+    direct_folders: int = 0
+
+
+def file_added(folder_id: int, size: Optional[int], sign: int = 1) -> StatsDelta:
+    return StatsDelta(
+        folder_id, files=sign, bytes=sign * (size or 0), direct_files=sign
+    )
+
+
+def file_removed(folder_id: int, size: Optional[int]) -> StatsDelta:
+    return file_added(folder_id, size, sign=-1)
+
+
+def _path_ids_sql(path):
+    return cast(func.string_to_array(func.trim(path, "/"), "/"), ARRAY(Integer))
+
+
+class FolderStatsService:
+    """Folder rollups kept up to date with deltas along the ancestor chain.
+
+    There is no lock beyond the rows themselves. ``apply`` locks the chain
+    in id order as part of its UPDATE, so writers only queue on the rows
+    they share, and only from that statement until they commit. Every
+    change still updates its root folder's row, so writes under one root
+    go through that row one transaction at a time. Callers apply their
+    deltas as the last write before ``VersionService.bump`` to keep that
+    window short.
+    """
+
+    @staticmethod
+    async def apply(db: AsyncSession, deltas: Iterable[StatsDelta]) -> None:
+        """Add ``deltas`` to each folder and its ancestors in one statement.
+
+        The ancestors are read from the snapshot the statement starts with.
+        Raises 409 when a concurrent move changed a folder's path before
+        its row could be locked.
+        """
+        deltas = [d for d in deltas if d.folder_id is not None and any(d[1:])]
+        if not deltas:
+            return
+
+        columns = list(zip(*deltas))
+        values = (
+            func.unnest(
+                literal(list(columns[0]), ARRAY(Integer)),
+                literal(list(columns[1]), ARRAY(Integer)),
+                literal(list(columns[2]), ARRAY(BigInteger)),
+                literal(list(columns[3]), ARRAY(Integer)),
+                literal(list(columns[4]), ARRAY(Integer)),
+                literal(list(columns[5]), ARRAY(Integer)),
+            )
+            .table_valued(*StatsDelta._fields)
+            .render_derived()
+        )
+        origin = aliased(Folder)
+        ancestor = aliased(Folder)
+        is_origin = ancestor.id == values.c.folder_id
+        chain = (
+            select(
+                ancestor.id,
+                func.sum(values.c.files).label("files"),
+                func.sum(values.c.bytes).label("bytes"),
+                func.sum(values.c.folders).label("folders"),
+                func.sum(case((is_origin, values.c.direct_files), else_=0)).label(
+                    "direct_files"
+                ),
+                func.sum(case((is_origin, values.c.direct_folders), else_=0)).label(
+                    "direct_folders"
+                ),
+                # Path the chain was read from, on the origin's own row
+                func.max(case((is_origin, origin.path))).label("path"),
+            )
+            .select_from(values)
+            .join(origin, origin.id == values.c.folder_id)
+            .join(ancestor, ancestor.id == func.any(_path_ids_sql(origin.path)))
+            .group_by(ancestor.id)
+            .order_by(ancestor.id)
+            .subquery()
+        )
+        # Joined row by row against the primary key in that order, so
+        # concurrent writers lock shared ancestors in the same order
+        result = await db.execute(
+            update(Folder)
+            .where(Folder.id == chain.c.id)
+            .values(
+                file_count=Folder.file_count + chain.c.direct_files,
+                subfolder_count=Folder.subfolder_count + chain.c.direct_folders,
+                total_file_count=Folder.total_file_count + chain.c.files,
+                total_folder_count=Folder.total_folder_count + chain.c.folders,
+                total_bytes=Folder.total_bytes + chain.c.bytes,
+                updated_at=Folder.updated_at,
+            )
+            .returning(Folder.path, chain.c.path)
+            .execution_options(synchronize_session=False)
+        )
+        # RETURNING shows the latest path of each locked row. Once an origin
+        # is locked its path can't change, so if it still matches, the chain
+        # was right.
+        if any(read is not None and latest != read for latest, read in result):
+            await db.rollback()
+            raise HTTPException(
+                status_code=409, detail="Folder hierarchy changed, please retry"
+            )
+
+    @staticmethod
+    async def schedule_repair(db: AsyncSession) -> int:
+        """Enqueue a repair of every tree; returns the job id."""
+        result = await db.execute(
+            select(Folder.id).where(Folder.parent_id.is_(None)).order_by(Folder.id)
+        )
+        root_ids = result.scalars().all()
+        job_id = await JobService.enqueue(
+            db,
+            REPAIR_FOLDER_STATS,
+            payload={"root_ids": root_ids},
+            total=len(root_ids),
+        )
+        await db.commit()
+        return job_id
+
+    @staticmethod
+    async def repair_tree(db: AsyncSession, root_id: int) -> int:
+        """Recompute the stats of every folder under ``root_id`` from scratch.
+
+        Missing file sizes are read from the blob store first. Returns how
+        many folders had drifted.
+        """
+        in_tree = Folder.path.startswith(f"/{root_id}/")
+        # The same row locks apply takes, so deltas wait for the repair and
+        # then add to the recomputed values
+        await db.execute(
+            select(Folder.id)
+            .where(in_tree)
+            .order_by(Folder.id)
+            .with_for_update(key_share=True)
+        )
+
+        result = await db.execute(
+            select(File.content_hash)
+            .join(Folder, Folder.id == File.folder_id)
+            .where(in_tree, File.size_bytes.is_(None), File.content_hash.is_not(None))
+            .distinct()
+        )
+        sizes = {}
+        for content_hash in result.scalars():
+            size = await blob_store.size(content_hash)
+            if size is not None:
+                sizes[content_hash] = size
+        if sizes:
+            known = (
+                func.unnest(
+                    literal(list(sizes), ARRAY(Text)),
+                    literal(list(sizes.values()), ARRAY(BigInteger)),
+                )
+                .table_valued("content_hash", "size")
+                .render_derived()
+            )
+            await db.execute(
+                update(File)
+                .where(File.content_hash == known.c.content_hash)
+                .where(File.size_bytes.is_(None))
+                .where(File.folder_id.in_(select(Folder.id).where(in_tree)))
+                .values(size_bytes=known.c.size, updated_at=File.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+
+        expected = _expected_stats(in_tree)
+        stats = (
+            Folder.file_count,
+            Folder.subfolder_count,
+            Folder.total_file_count,
+            Folder.total_folder_count,
+            Folder.total_bytes,
+        )
+        result = await db.execute(
+            update(Folder)
+            .where(Folder.id == expected.c.id)
+            .where(
+                or_(
+                    *(
+                        column.is_distinct_from(expected.c[column.key])
+                        for column in stats
+                    )
+                )
+            )
+            .values(
+                **{column.key: expected.c[column.key] for column in stats},
+                updated_at=Folder.updated_at,
+            )
+            .returning(Folder.id)
+            .execution_options(synchronize_session=False)
+        )
+        return len(result.all())
+
+
+def _expected_stats(in_tree):
+    """Stats of every folder matching ``in_tree``, computed from the rows."""
+    file_paths = (
+        select(
+            func.unnest(_path_ids_sql(Folder.path)).label("id"),
+            File.size_bytes,
+        )
+        .join_from(File, Folder, File.folder_id == Folder.id)
+        .where(in_tree)
+        .subquery()
+    )
+    files = (
+        select(
+            file_paths.c.id,
+            func.count().label("total_file_count"),
+            func.coalesce(func.sum(file_paths.c.size_bytes), 0).label("total_bytes"),
+        )
+        .group_by(file_paths.c.id)
+        .subquery()
+    )
+    direct_files = (
+        select(File.folder_id.label("id"), func.count().label("file_count"))
+        .join(Folder, Folder.id == File.folder_id)
+        .where(in_tree)
+        .group_by(File.folder_id)
+        .subquery()
+    )
+    folder_paths = (
+        select(
+            func.unnest(_path_ids_sql(Folder.path)).label("id"),
+            Folder.id.label("folder_id"),
+            Folder.parent_id,
+        )
+        .where(in_tree)
+        .subquery()
+    )
+    folders = (
+        select(
+            folder_paths.c.id,
+            func.count().label("total_folder_count"),
+            func.count()
+            .filter(folder_paths.c.parent_id == folder_paths.c.id)
+            .label("subfolder_count"),
+        )
+        .where(folder_paths.c.folder_id != folder_paths.c.id)
+        .group_by(folder_paths.c.id)
+        .subquery()
+    )
+    return (
+        select(
+            Folder.id,
+            func.coalesce(direct_files.c.file_count, 0).label("file_count"),
+            func.coalesce(folders.c.subfolder_count, 0).label("subfolder_count"),
+            func.coalesce(files.c.total_file_count, 0).label("total_file_count"),
+            func.coalesce(folders.c.total_folder_count, 0).label("total_folder_count"),
+            func.coalesce(files.c.total_bytes, 0).label("total_bytes"),
+        )
+        .outerjoin(direct_files, direct_files.c.id == Folder.id)
+        .outerjoin(files, files.c.id == Folder.id)
+        .outerjoin(folders, folders.c.id == Folder.id)
+        .where(in_tree)
+        .subquery()
+    )
+
+
+async def repair_folder_stats(db: AsyncSession, job: Job) -> None:
+    """Recompute folder stats one tree at a time, committing after each."""
+    root_ids: List[int] = job.payload["root_ids"]
+    for index in range(job.progress, len(root_ids)):
+        await FolderStatsService.repair_tree(db, root_ids[index])
+        await JobService.set_progress(db, job.id, index + 1)
+        await db.commit()
@@ -0,0 +1,416 @@
+import asyncio
+import os
+import uuid
+import zipfile
+from typing import AsyncIterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import BigInteger, Integer, Text, cast, func, insert, literal, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from src.core.config import settings
+from src.core.storage import BlobRef, blob_store, remove_quietly, write_stream
+from src.models.file import File
+from src.models.folder import Folder
+from src.models.job import Job
+from src.services.bulk import CREATED
+from src.services.changes import FILE, FOLDER, change
+from src.services.file import FileService
+from src.services.folder_stats import FolderStatsService, StatsDelta, file_added
+from src.services.job import JobService
+from src.services.processing import PROCESS_PDF
+from src.services.tree_cache import tree_cache
+from src.services.version import VersionService
+
+IMPORT_ARCHIVE = "import_archive"
+
+IMPORT_DIR = os.path.join(settings.UPLOAD_DIR, "imports")
+NAME_LENGTH = Folder.name.type.length
+# The target folder itself, as the parent of top-level entries
+TARGET = -1
+
+
+class ImportFolder(NamedTuple):
+    name: str
+    parent: int  # index into ImportPlan.folders, or TARGET
+    depth: int
+
+
+class ImportFile(NamedTuple):
+    name: str
+    folder: int
+    info: zipfile.ZipInfo
+
+
+class ImportPlan(NamedTuple):
+    """What an archive creates, in creation order.
+
+    Folders come parents first and files grouped by folder. The order only
+    depends on the archive, so a retried job finds the same plan and can
+    skip the ``progress`` units it already committed: folders, then files.
+    """
+
+    folders: List[ImportFolder]
+    files: List[ImportFile]
+    skipped: int
+
+
+def _entry_parts(filename: str) -> Optional[Tuple[str, ...]]:
+    parts = tuple(
+        part for part in filename.replace("\\", "/").split("/") if part not in ("", ".")
+    )
+    # Hidden files and macOS resource forks are not part of the tree
+    if not parts or parts[0] == "__MACOSX" or ".." in parts:
+        return None
+    if any(part.startswith(".") for part in parts):
+        return None
+    return parts
+
+
+def _importable(info: zipfile.ZipInfo) -> bool:
+    encrypted = info.flag_bits & 0x1
+    return (
+        info.filename.lower().endswith(".pdf")
+        and not encrypted
+        and info.file_size <= settings.MAX_UPLOAD_SIZE
+    )
+
+
+def read_plan(archive: zipfile.ZipFile, into_root: bool) -> ImportPlan:
+    """Build the plan from the archive's central directory.
+
+    Only PDFs are imported. With ``into_root`` top-level folders become root
+    folders, and files outside any folder have nowhere to go.
+    """
+    directories = set()
+    members = []
+    skipped = 0
+    for info in archive.infolist():
+        parts = _entry_parts(info.filename)
+        if info.is_dir():
+            if parts is not None:
+                directories.update(parts[:end] for end in range(1, len(parts) + 1))
+            continue
+        if parts is None or not _importable(info) or (into_root and len(parts) == 1):
+            skipped += 1
+            continue
+        directories.update(parts[:end] for end in range(1, len(parts)))
+        members.append((parts, info))
+
+    ordered = sorted(directories, key=lambda parts: (len(parts), parts))
+    index = {parts: position for position, parts in enumerate(ordered)}
+    folders = [
+        ImportFolder(parts[-1][:NAME_LENGTH], index.get(parts[:-1], TARGET), len(parts))
+        for parts in ordered
+    ]
+    files = []
+    for parts, info in members:
+        folder = index[parts[:-1]] if len(parts) > 1 else TARGET
+        files.append(ImportFile(parts[-1][: -len(".pdf")][:NAME_LENGTH], folder, info))
+    files.sort(key=lambda file: (file.folder, file.name, file.info.filename))
+    return ImportPlan(folders, files, skipped)
+
+
+def _open_plan(path: str, into_root: bool) -> Tuple[zipfile.ZipFile, ImportPlan]:
+    archive = zipfile.ZipFile(path)
+    try:
+        return archive, read_plan(archive, into_root)
+    except BaseException:
+        archive.close()
+        raise
+
+
+async def _member_chunks(
+    archive: zipfile.ZipFile, info: zipfile.ZipInfo
+) -> AsyncIterator[bytes]:
+    # zipfile serializes reads of the shared file, so members can be read
+    # from several threads at once; the CRC is checked at the end
+    member = await asyncio.to_thread(archive.open, info)
+    try:
+        while chunk := await asyncio.to_thread(member.read, settings.UPLOAD_CHUNK_SIZE):
+            yield chunk
+    finally:
+        member.close()
+
+
+class ImportService:
+
+    @staticmethod
+    async def start(
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        parent_id: Optional[int],
+        content_length: Optional[int] = None,
+    ) -> dict:
+        """Store an uploaded zip and queue the job that imports it."""
+        if content_length is not None and content_length > settings.MAX_IMPORT_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archive exceeds the maximum size of "
+                f"{settings.MAX_IMPORT_SIZE} bytes",
+            )
+        if parent_id is not None:
+            result = await db.execute(select(Folder.id).where(Folder.id == parent_id))
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(
+                    status_code=404, detail="Parent folder does not exist"
+                )
+            await db.commit()  # don't hold the connection during the upload
+
+        name = f"{uuid.uuid4().hex}.zip"
+        path = os.path.join(IMPORT_DIR, name)
+        await write_stream(chunks, path, settings.MAX_IMPORT_SIZE)
+        try:
+            archive, plan = await asyncio.to_thread(_open_plan, path, parent_id is None)
+        except zipfile.BadZipFile:
+            remove_quietly(path)
+            raise HTTPException(status_code=400, detail="Not a valid zip archive")
+        archive.close()
+
+        job_id = await JobService.enqueue(
+            db,
+            IMPORT_ARCHIVE,
+            payload={"archive": name, "parent_id": parent_id},
+            total=len(plan.folders) + len(plan.files),
+        )
+        await db.commit()
+        return {
+            "job_id": job_id,
+            "folders": len(plan.folders),
+            "files": len(plan.files),
+            "skipped": plan.skipped,
+        }
+
+    @staticmethod
+    async def allocate_folder_ids(db: AsyncSession, count: int) -> List[int]:
+        result = await db.execute(
+            select(
+                func.nextval(func.pg_get_serial_sequence("folders", "id"))
+            ).select_from(func.generate_series(1, count))
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def create_folders(
+        db: AsyncSession,
+        plan: ImportPlan,
+        folder_ids: Sequence[int],
+        parent_id: Optional[int],
+        start: int,
+        end: int,
+    ) -> None:
+        """Create ``plan.folders[start:end]`` with their preallocated ids.
+
+        Each level is one multi-row INSERT that reads its parents' paths, so
+        rows are inserted with their final path even when a folder created
+        by an earlier batch has been moved since.
+        """
+
+        def parent_of(folder: ImportFolder) -> Optional[int]:
+            return parent_id if folder.parent == TARGET else folder_ids[folder.parent]
+
+        batch = range(start, end)
+        parents = {parent_of(plan.folders[i]) for i in batch}
+
+        for depth in sorted({plan.folders[i].depth for i in batch}):
+            level = [i for i in batch if plan.folders[i].depth == depth]
+            ids = [folder_ids[i] for i in level]
+            names = [plan.folders[i].name for i in level]
+            parent_ids = [parent_of(plan.folders[i]) for i in level]
+            if depth == 1 and parent_id is None:
+                await db.execute(
+                    insert(Folder).values(
+                        [
+                            {"id": i, "name": name, "path": f"/{i}/", "depth": 0}
+                            for i, name in zip(ids, names)
+                        ]
+                    )
+                )
+                continue
+
+            values = (
+                func.unnest(
+                    literal(ids, ARRAY(Integer)),
+                    literal(names, ARRAY(Text)),
+                    literal(parent_ids, ARRAY(Integer)),
+                )
+                .table_valued("id", "name", "parent_id")
+                .render_derived()
+            )
+            parent = aliased(Folder)
+            source = select(
+                values.c.id,
+                values.c.name,
+                values.c.parent_id,
+                parent.path + cast(values.c.id, Text) + "/",
+                parent.depth + 1,
+            ).join(parent, parent.id == values.c.parent_id)
+            result = await db.execute(
+                insert(Folder).from_select(
+                    ["id", "name", "parent_id", "path", "depth"], source
+                )
+            )
+            if result.rowcount != len(level):
+                await db.rollback()
+                raise HTTPException(
+                    status_code=404, detail="Parent folder does not exist"
+                )
+
+        deltas = [
+            StatsDelta(parent_of(plan.folders[i]), folders=1, direct_folders=1)
+            for i in batch
+        ]
+        await FolderStatsService.apply(db, deltas)
+        changes = [
+            change(
+                FOLDER,
+                CREATED,
+                folder_ids[i],
+                name=plan.folders[i].name,
+                parent_id=parent_of(plan.folders[i]),
+            )
+            for i in batch
+        ]
+        await tree_cache.invalidate_on_commit(db, parents)
+        await VersionService.bump(db, changes=changes)
+
+    @staticmethod
+    async def create_files(
+        db: AsyncSession,
+        archive: zipfile.ZipFile,
+        files: Sequence[ImportFile],
+        folder_ids: Sequence[Optional[int]],
+    ) -> None:
+        """Store the blobs of ``files``, then add their rows in one statement.
+
+        ``folder_ids`` holds each file's folder. Blobs are written
+        ``IMPORT_CONCURRENCY`` at a time before the transaction starts, so no
+        lock is held while they are copied.
+        """
+        semaphore = asyncio.Semaphore(settings.IMPORT_CONCURRENCY)
+
+        async def store(file: ImportFile) -> BlobRef:
+            async with semaphore:
+                return await blob_store.put_stream(_member_chunks(archive, file.info))
+
+        blobs = await _gather(store(file) for file in files)
+
+        # Same protocol as single uploads: a blob released by a concurrent
+        # delete before the locks were taken is written again
+        await FileService.lock_blobs(db, [blob.sha256 for blob in blobs])
+        for position, blob in enumerate(blobs):
+            if not await blob_store.exists(blob.sha256):
+                blobs[position] = await store(files[position])
+
+        values = (
+            func.unnest(
+                literal([file.name for file in files], ARRAY(Text)),
+                literal(list(folder_ids), ARRAY(Integer)),
+                literal([blob.sha256 for blob in blobs], ARRAY(Text)),
+                literal([blob.size for blob in blobs], ARRAY(BigInteger)),
+            )
+            .table_valued("name", "folder_id", "content_hash", "size_bytes")
+            .render_derived()
+        )
+        source = select(
+            values.c.name,
+            literal("pdf"),
+            values.c.folder_id,
+            values.c.content_hash,
+            values.c.size_bytes,
+        ).join(Folder, Folder.id == values.c.folder_id)
+        result = await db.execute(
+            insert(File)
+            .from_select(
+                ["name", "extension", "folder_id", "content_hash", "size_bytes"],
+                source,
+            )
+            .returning(File.id, File.name, File.folder_id, File.size_bytes)
+        )
+        rows = result.all()
+        if len(rows) != len(files):
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Folder does not exist")
+
+        await FolderStatsService.apply(
+            db, [file_added(row.folder_id, row.size_bytes) for row in rows]
+        )
+        await JobService.enqueue_files(db, PROCESS_PDF, [row.id for row in rows])
+        changes = [
+            change(
+                FILE,
+                CREATED,
+                row.id,
+                name=row.name,
+                extension="pdf",
+                folder_id=row.folder_id,
+            )
+            for row in rows
+        ]
+        await tree_cache.invalidate_on_commit(db, folder_ids, files_only=True)
+        await VersionService.bump(db, set(folder_ids), changes)
+
+
+async def _gather(coroutines) -> list:
+    """``asyncio.gather`` that cancels the others when one fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def import_archive(db: AsyncSession, job: Job) -> None:
+    """Create the folders and files of an uploaded zip, batch by batch.
+
+    Every batch commits together with the job's progress, so a retried job
+    resumes after the last committed batch. Folder ids are allocated once,
+    up front, and kept in the payload for the same reason.
+    """
+    path = os.path.join(IMPORT_DIR, job.payload["archive"])
+    parent_id = job.payload["parent_id"]
+    if job.progress >= (job.total or 0):
+        await asyncio.to_thread(remove_quietly, path)
+        return
+
+    archive, plan = await asyncio.to_thread(_open_plan, path, parent_id is None)
+    try:
+        folder_ids = job.payload.get("folder_ids")
+        if folder_ids is None:
+            folder_ids = await ImportService.allocate_folder_ids(db, len(plan.folders))
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(payload={**job.payload, "folder_ids": folder_ids})
+            )
+            await db.commit()
+
+        batch_size = settings.IMPORT_BATCH_SIZE
+        folder_count = len(plan.folders)
+        for start in range(job.progress, folder_count, batch_size):
+            end = min(start + batch_size, folder_count)
+            await ImportService.create_folders(
+                db, plan, folder_ids, parent_id, start, end
+            )
+            await JobService.set_progress(db, job.id, end)
+            await db.commit()
+
+        first_file = max(job.progress - folder_count, 0)
+        for start in range(first_file, len(plan.files), batch_size):
+            files = plan.files[start : start + batch_size]
+            file_folder_ids = [
+                parent_id if file.folder == TARGET else folder_ids[file.folder]
+                for file in files
+            ]
+            await ImportService.create_files(db, archive, files, file_folder_ids)
+            await JobService.set_progress(db, job.id, folder_count + start + len(files))
+            await db.commit()
+    finally:
+        archive.close()
+    await asyncio.to_thread(remove_quietly, path)
@@ -0,0 +1,180 @@
+from datetime import timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import Integer, and_, func, insert, literal, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.models.job import Job
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+NOTIFY_CHANNEL = "jobs"
+RETRY_DELAY = 30  # seconds, doubled on every further attempt
+MAX_ERROR_LENGTH = 2000
+
+
+class JobService:
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession,
+        kind: str,
+        file_id: Optional[int] = None,
+        payload: Optional[dict] = None,
+        total: Optional[int] = None,
+    ) -> int:
+        """Add a job to the current transaction and return its id.
+
+        Workers are woken through NOTIFY, which PostgreSQL only delivers on
+        commit, so a job is never picked up before the data it refers to.
+        """
+        inserted = (
+            insert(Job)
+            .values(
+                kind=kind,
+                file_id=file_id,
+                payload=payload or {},
+                total=total,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+            )
+            .returning(Job.id)
+            .cte("inserted")
+        )
+        result = await db.execute(
+            select(inserted.c.id, func.pg_notify(NOTIFY_CHANNEL, kind))
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def enqueue_files(db: AsyncSession, kind: str, file_ids: List[int]) -> None:
+        """Add one job per file in a single statement, waking workers once."""
+        if not file_ids:
+            return
+        inserted = (
+            insert(Job)
+            .from_select(
+                ["kind", "file_id", "max_attempts"],
+                select(
+                    literal(kind),
+                    func.unnest(literal(file_ids, ARRAY(Integer))),
+                    literal(settings.JOB_MAX_ATTEMPTS),
+                ),
+            )
+            .returning(Job.id)
+            .cte("inserted")
+        )
+        await db.execute(
+            select(func.count(inserted.c.id), func.pg_notify(NOTIFY_CHANNEL, kind))
+        )
+
+    @staticmethod
+    async def claim(db: AsyncSession, kinds: Iterable[str]) -> Optional[Job]:
+        """Lease the oldest runnable job and commit, or return None.
+
+        Jobs whose lease ran out (their worker died) are runnable again as
+        long as they have attempts left.
+        """
+        runnable = (
+            select(Job.id)
+            .where(Job.kind.in_(list(kinds)))
+            .where(
+                or_(
+                    and_(Job.status == QUEUED, Job.run_after <= func.now()),
+                    and_(
+                        Job.status == RUNNING,
+                        Job.locked_until < func.now(),
+                        Job.attempts < Job.max_attempts,
+                    ),
+                )
+            )
+            .order_by(Job.run_after, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(Job)
+            .where(Job.id == runnable)
+            .values(
+                status=RUNNING,
+                attempts=Job.attempts + 1,
+                locked_until=func.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            )
+            .returning(Job)
+        )
+        job = result.scalars().first()
+        await db.commit()
+        return job
+
+    @staticmethod
+    async def get(db: AsyncSession, job_id: int) -> Optional[Job]:
+        result = await db.execute(select(Job).where(Job.id == job_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def set_progress(db: AsyncSession, job_id: int, progress: int) -> None:
+        # Progress shows the worker is alive, so it also extends the lease
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                progress=progress,
+                locked_until=func.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            )
+        )
+
+    @staticmethod
+    async def complete(db: AsyncSession, job_id: int) -> None:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status=SUCCEEDED, locked_until=None, last_error=None)
+        )
+
+    @staticmethod
+    async def fail(db: AsyncSession, job: Job, error: str) -> None:
+        """Schedule a retry with exponential backoff, or give up."""
+        values = {"locked_until": None, "last_error": error[:MAX_ERROR_LENGTH]}
+        if job.attempts >= job.max_attempts:
+            values["status"] = FAILED
+        else:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            values["status"] = QUEUED
+            values["run_after"] = func.now() + timedelta(seconds=delay)
+        await db.execute(update(Job).where(Job.id == job.id).values(**values))
+        await db.commit()
+
+    @staticmethod
+    async def release(db: AsyncSession, job_id: int) -> None:
+        """Hand a job back without counting the attempt, e.g. on shutdown."""
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == RUNNING)
+            .values(status=QUEUED, attempts=Job.attempts - 1, locked_until=None)
+        )
+        await db.commit()
+
+    @staticmethod
+    async def expire_leases(db: AsyncSession) -> int:
+        """Fail running jobs whose lease ran out on their last attempt."""
+        result = await db.execute(
+            update(Job)
+            .where(
+                Job.status == RUNNING,
+                Job.locked_until < func.now(),
+                Job.attempts >= Job.max_attempts,
+            )
+            .values(status=FAILED, locked_until=None, last_error="Lease expired")
+        )
+        await db.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def stats(db: AsyncSession) -> dict:
+        result = await db.execute(select(Job.status, func.count()).group_by(Job.status))
+        return {status: count for status, count in result.all()}
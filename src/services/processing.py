@@ -0,0 +1,55 @@
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.pdf import extract_metadata
+from src.core.storage import blob_store, thumbnail_store
+from src.models.file import File
+from src.models.job import Job
+from src.services.bulk import UPDATED
+from src.services.changes import FILE, change
+from src.services.version import VersionService
+from src.services.worker import job_worker
+
+PROCESS_PDF = "process_pdf"
+
+
+async def process_pdf(db: AsyncSession, job: Job) -> None:
+    """Fill in page count, text and thumbnail of an uploaded PDF."""
+    result = await db.execute(
+        select(File.folder_id, File.content_hash).where(File.id == job.file_id)
+    )
+    file = result.first()
+    if file is None or not file.content_hash:
+        return  # deleted since, or nothing was uploaded
+
+    # Identical bytes were processed before; reuse that work
+    result = await db.execute(
+        select(File.page_count, File.has_thumbnail, File.text_content)
+        .where(File.content_hash == file.content_hash)
+        .where(File.processed_at.is_not(None))
+        .limit(1)
+    )
+    processed = result.first()
+    if processed is not None:
+        metadata = dict(processed._mapping)
+    else:
+        metadata = await job_worker.run_cpu(
+            extract_metadata,
+            blob_store.path_for(file.content_hash),
+            thumbnail_store.path_for(file.content_hash),
+        )
+
+    await db.execute(
+        update(File)
+        .where(File.id == job.file_id)
+        .values(**metadata, processed_at=func.now(), updated_at=File.updated_at)
+    )
+    processed = change(
+        FILE,
+        UPDATED,
+        job.file_id,
+        page_count=metadata["page_count"],
+        has_thumbnail=metadata["has_thumbnail"],
+    )
+    await VersionService.bump(db, [file.folder_id], [processed])
@@ -0,0 +1,162 @@
+import re
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import func, literal, literal_column, null, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.file import File
+from src.models.folder import Folder
+from src.services.folder import _in_subtree, _path_ids
+
+# Must match the expression of the ix_*_name_search indexes exactly
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def _search_vector(column):
+    return func.to_tsvector(SEARCH_CONFIG, column)
+
+
+# Shorter words only match whole words; "a:*" would match most names
+MIN_PREFIX_LENGTH = 2
+
+
+def _prefix_query(q: str) -> Optional[str]:
+    # Every word of the query must prefix a word of the name, so "qua rep"
+    # finds "Quarterly Report". Only letters and digits reach to_tsquery;
+    # "_" is a word character for \w but a separator to the parser, and
+    # to_tsquery would read "a_b" as the phrase "a <-> b".
+    words = re.findall(r"[^\W_]+", q.lower())
+    terms = [f"{word}:*" if len(word) >= MIN_PREFIX_LENGTH else word for word in words]
+    if not any(term.endswith(":*") for term in terms):
+        return None
+    return " & ".join(terms)
+
+
+def _ranking(name, needle: str) -> list:
+    # Names starting with the query first, then shorter names
+    return [
+        func.starts_with(func.lower(name), needle).desc(),
+        func.length(name),
+        name,
+    ]
+
+
+class SearchService:
+
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        q: str,
+        kind: Optional[str] = None,
+        folder_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> tuple[List[dict], Optional[int]]:
+        """Find files and folders by name, best matches first.
+
+        Names starting with the query rank first, then shorter names. Results
+        can be limited to the subtree under ``folder_id``. A query without a
+        word of at least ``MIN_PREFIX_LENGTH`` characters finds nothing.
+        """
+        tsquery_text = _prefix_query(q)
+        if tsquery_text is None:
+            return [], None
+        query = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+        needle = q.strip().lower()
+        # Each kind ranks and cuts its own matches first, so the final sort
+        # only sees the rows that can still make it onto this page
+        branch_limit = offset + limit + 1
+
+        scope_path = None
+        if folder_id is not None:
+            result = await db.execute(select(Folder.path).where(Folder.id == folder_id))
+            scope_path = result.scalar_one_or_none()
+            if scope_path is None:
+                raise HTTPException(status_code=404, detail="Folder not found")
+
+        selects = []
+        if kind in (None, "file"):
+            files = (
+                select(
+                    literal("file").label("type"),
+                    File.id,
+                    File.name,
+                    File.extension,
+                    File.folder_id,
+                    Folder.path.label("ancestry"),
+                    File.created_at,
+                    File.updated_at,
+                )
+                .join(Folder, File.folder_id == Folder.id)
+                .where(_search_vector(File.name).op("@@")(query))
+            )
+            if scope_path is not None:
+                files = files.where(_in_subtree(Folder.path, scope_path))
+            files = files.order_by(*_ranking(File.name, needle), File.id)
+            selects.append(files.limit(branch_limit))
+        if kind in (None, "folder"):
+            folders = select(
+                literal("folder").label("type"),
+                Folder.id,
+                Folder.name,
+                null().label("extension"),
+                Folder.parent_id.label("folder_id"),
+                Folder.path.label("ancestry"),
+                Folder.created_at,
+                Folder.updated_at,
+            ).where(_search_vector(Folder.name).op("@@")(query))
+            if scope_path is not None:
+                folders = folders.where(
+                    _in_subtree(Folder.path, scope_path), Folder.id != folder_id
+                )
+            folders = folders.order_by(*_ranking(Folder.name, needle), Folder.id)
+            selects.append(folders.limit(branch_limit))
+
+        hits = union_all(*selects).subquery()
+        result = await db.execute(
+            select(hits)
+            .order_by(*_ranking(hits.c.name, needle), hits.c.type, hits.c.id)
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        rows = result.all()
+        next_offset = offset + limit if len(rows) > limit else None
+        rows = rows[:limit]
+
+        # A folder's ancestry includes itself; a file's is its folder's
+        ancestries = {}
+        for row in rows:
+            ids = _path_ids(row.ancestry)
+            ancestries[(row.type, row.id)] = ids[:-1] if row.type == "folder" else ids
+        crumbs = await SearchService._crumbs(
+            db, {i for ids in ancestries.values() for i in ids}
+        )
+
+        items = [
+            {
+                "type": row.type,
+                "id": row.id,
+                "name": row.name,
+                "extension": row.extension,
+                "folder_id": row.folder_id,
+                "path": [
+                    crumbs[i] for i in ancestries[(row.type, row.id)] if i in crumbs
+                ],
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+            }
+            for row in rows
+        ]
+        return items, next_offset
+
+    @staticmethod
+    async def _crumbs(db: AsyncSession, folder_ids: set) -> dict:
+        if not folder_ids:
+            return {}
+        result = await db.execute(
+            select(Folder.id, Folder.name, Folder.parent_id).where(
+                Folder.id.in_(folder_ids)
+            )
+        )
+        return {row.id: dict(row._mapping) for row in result.all()}
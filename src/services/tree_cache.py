@@ -0,0 +1,228 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.notifications import PgListener, notify_on_commit
+from src.core.responses import encode_json
+
+NOTIFY_CHANNEL = "tree_cache"
+# NOTIFY payloads are capped at 8000 bytes; larger changes clear everything.
+MAX_NOTIFY_PAYLOAD = 7000
+PENDING_KEY = "tree_cache_pending"
+
+# Stands for "the list of root folders" in a snapshot's folder set.
+ROOT = None
+
+
+@dataclass(frozen=True)
+class TreeKey:
+    folder_id: Optional[int]
+    max_depth: Optional[int]
+    include_files: bool
+
+
+@dataclass(frozen=True)
+class TreeSnapshot:
+    """A cached tree, kept as the encoded response body so hits cost no
+    serialization at all. A subtree's body is its root node, not a list.
+    """
+
+    body: bytes
+    folder_ids: frozenset
+    version: str
+    modified_at: datetime
+    expires_at: float
+
+
+class LocalBackend:
+    """Invalidations stay inside this process."""
+
+    async def publish(self, db: AsyncSession, message: dict) -> None:
+        pass
+
+    def attach(self, cache: "TreeCache", listener: PgListener) -> None:
+        pass
+
+
+class PostgresNotifyBackend:
+    """Shares invalidations between workers through LISTEN/NOTIFY.
+
+    The NOTIFY is sent inside the writing transaction, so PostgreSQL only
+    delivers it once the change is committed. It rides along with the
+    version bump when the invalidation is queued before it.
+    """
+
+    def __init__(self):
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def publish(self, db: AsyncSession, message: dict) -> None:
+        payload = json.dumps({**message, "origin": self.origin})
+        if len(payload) > MAX_NOTIFY_PAYLOAD:
+            payload = json.dumps({"all": True, "origin": self.origin})
+        notify_on_commit(db, NOTIFY_CHANNEL, payload)
+
+    def attach(self, cache: "TreeCache", listener: PgListener) -> None:
+        def handle(payload: str) -> None:
+            message = json.loads(payload)
+            if message.get("origin") == self.origin:
+                return
+            if message.get("all"):
+                cache.clear()
+            else:
+                cache.invalidate(message["folder_ids"], message["files_only"])
+
+        listener.subscribe(NOTIFY_CHANNEL, handle)
+        listener.on_reconnect(cache.clear)
+
+
+class TreeCache:
+    """LRU + TTL cache of folder trees keyed by root, depth and file inclusion.
+
+    Each snapshot remembers which folders it contains, so a change to a
+    folder only evicts the snapshots that actually show it.
+    """
+
+    def __init__(self, backend, max_entries: int, ttl: float):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[TreeKey, TreeSnapshot]" = OrderedDict()
+        # Bumped on every invalidation; loads that overlap one are not stored.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key: TreeKey) -> Optional[TreeSnapshot]:
+        snapshot = self._entries.get(key)
+        if snapshot is not None and snapshot.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return snapshot
+        if snapshot is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        key: TreeKey,
+        tree: List[dict],
+        version: str,
+        modified_at: datetime,
+        generation: int,
+    ) -> TreeSnapshot:
+        content = tree[0] if key.folder_id is not None and tree else tree
+        snapshot = TreeSnapshot(
+            body=encode_json(content),
+            folder_ids=_folder_ids(tree, key.folder_id is None),
+            version=version,
+            modified_at=modified_at,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        # Missing subtrees are not cached: the id may still be created later.
+        if generation == self.generation and (tree or key.folder_id is None):
+            self._entries[key] = snapshot
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return snapshot
+
+    def invalidate(
+        self, folder_ids: Iterable[Optional[int]], files_only: bool = False
+    ) -> None:
+        folder_ids = set(folder_ids)
+        self.generation += 1
+        for key, snapshot in list(self._entries.items()):
+            if files_only and not key.include_files:
+                continue
+            if not snapshot.folder_ids.isdisjoint(folder_ids):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    async def invalidate_on_commit(
+        self,
+        db: AsyncSession,
+        folder_ids: Iterable[Optional[int]],
+        files_only: bool = False,
+    ) -> None:
+        """Evict snapshots showing ``folder_ids`` once ``db`` commits.
+
+        Pass ``ROOT`` among the ids when the list of root folders changes.
+        ``files_only`` spares snapshots built without files.
+        """
+        folder_ids = sorted(set(folder_ids), key=lambda i: -1 if i is None else i)
+        db.info.setdefault(PENDING_KEY, []).append((folder_ids, files_only))
+        await self.backend.publish(
+            db, {"folder_ids": folder_ids, "files_only": files_only}
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+def _folder_ids(tree: List[dict], includes_roots: bool) -> frozenset:
+    ids = {ROOT} if includes_roots else set()
+    stack = list(tree)
+    while stack:
+        node = stack.pop()
+        ids.add(node["id"])
+        stack.extend(node["subfolders"])
+    return frozenset(ids)
+
+
+def _build_backend():
+    if settings.TREE_CACHE_BACKEND == "postgres":
+        return PostgresNotifyBackend()
+    if settings.WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            "TREE_CACHE_BACKEND=local only works with a single worker; "
+            "use postgres when WEB_CONCURRENCY > 1"
+        )
+    return LocalBackend()
+
+
+tree_cache = TreeCache(
+    _build_backend(),
+    max_entries=settings.TREE_CACHE_MAX_ENTRIES,
+    ttl=settings.TREE_CACHE_TTL,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for folder_ids, files_only in session.info.pop(PENDING_KEY, []):
+        tree_cache.invalidate(folder_ids, files_only)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
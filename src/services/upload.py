@@ -0,0 +1,333 @@
+import asyncio
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
+
+import aiofiles
+from fastapi import HTTPException
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.periodic import PeriodicTask
+from src.core.storage import blob_store, remove_quietly, write_stream
+from src.models.file import File as FileModel
+from src.models.upload import UploadChunk, UploadSession
+from src.schemas.upload import UploadSessionCreate
+from src.services.file import FileService
+
+ACTIVE = "active"
+COMPLETING = "completing"
+COMPLETED = "completed"
+
+SESSIONS_DIR = os.path.join(settings.UPLOAD_DIR, "sessions")
+
+
+def _session_dir(session_id: str) -> str:
+    return os.path.join(SESSIONS_DIR, session_id)
+
+
+def _chunk_path(session_id: str, index: int) -> str:
+    return os.path.join(_session_dir(session_id), f"{index:06d}")
+
+
+def _chunk_length(session: UploadSession, index: int) -> int:
+    if index < session.chunk_count - 1:
+        return session.chunk_size
+    return session.size - session.chunk_size * (session.chunk_count - 1)
+
+
+def _expires_at() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+
+async def _read_chunks(session_id: str, chunk_count: int) -> AsyncIterator[bytes]:
+    for index in range(chunk_count):
+        async with aiofiles.open(_chunk_path(session_id, index), "rb") as chunk_file:
+            while data := await chunk_file.read(settings.UPLOAD_CHUNK_SIZE):
+                yield data
+
+
+async def _remove_session_dir(session_id: str) -> None:
+    await asyncio.to_thread(shutil.rmtree, _session_dir(session_id), True)
+
+
+class UploadService:
+    """Resumable uploads: create a session, PUT its chunks in any order and
+    as often as needed, then complete it to get the file.
+    """
+
+    @staticmethod
+    async def create_session(db: AsyncSession, data: UploadSessionCreate) -> dict:
+        max_size = settings.MAX_UPLOAD_SIZE
+        if data.size > max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File exceeds the maximum size of {max_size} bytes",
+            )
+        chunk_size = data.chunk_size or settings.UPLOAD_SESSION_CHUNK_SIZE
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            folder_id=data.folder_id,
+            filename=data.filename,
+            size=data.size,
+            chunk_size=chunk_size,
+            chunk_count=-(-data.size // chunk_size),
+            sha256=data.sha256.lower() if data.sha256 else None,
+            status=ACTIVE,
+            expires_at=_expires_at(),
+        )
+        db.add(session)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Folder does not exist")
+        return _describe(session, [])
+
+    @staticmethod
+    async def get_session(db: AsyncSession, session_id: str) -> dict:
+        session = await UploadService._get_session(db, session_id)
+        result = await db.execute(
+            select(UploadChunk.index, UploadChunk.size).where(
+                UploadChunk.session_id == session_id
+            )
+        )
+        return _describe(session, result.all())
+
+    @staticmethod
+    async def put_chunk(
+        db: AsyncSession,
+        session_id: str,
+        index: int,
+        chunks: AsyncIterator[bytes],
+        sha256: str,
+        content_length: Optional[int] = None,
+    ) -> dict:
+        session = await UploadService._get_session(db, session_id, active=True)
+        if not 0 <= index < session.chunk_count:
+            raise HTTPException(status_code=400, detail="Chunk index out of range")
+        expected = _chunk_length(session, index)
+        if content_length is not None and content_length != expected:
+            raise HTTPException(
+                status_code=400, detail=f"Chunk {index} must be {expected} bytes"
+            )
+        # Don't hold a pooled connection while the body streams in
+        await db.commit()
+
+        # Staged next to the chunk, and only moved into place once the
+        # session is known to still be active
+        path = _chunk_path(session_id, index)
+        staged = f"{path}.{uuid.uuid4().hex}"
+        stored = await write_stream(chunks, staged, max_size=expected)
+        try:
+            if stored.size != expected:
+                raise HTTPException(
+                    status_code=400, detail=f"Chunk {index} must be {expected} bytes"
+                )
+            if stored.sha256 != sha256.lower():
+                raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+
+            # Locks the session row, so completion can't start assembling
+            # until this chunk is in place
+            result = await db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session_id, UploadSession.status == ACTIVE)
+                .values(expires_at=_expires_at())
+                .returning(UploadSession.id)
+            )
+            if result.first() is None:
+                await db.rollback()
+                await UploadService._get_session(db, session_id, active=True)
+                raise HTTPException(
+                    status_code=409, detail="Upload session is no longer active"
+                )
+            os.replace(staged, path)
+        finally:
+            remove_quietly(staged)
+
+        # Re-sending a chunk replaces it, so retries are always safe
+        await db.execute(
+            insert(UploadChunk)
+            .values(
+                session_id=session_id,
+                index=index,
+                size=stored.size,
+                sha256=stored.sha256,
+            )
+            .on_conflict_do_update(
+                index_elements=[UploadChunk.session_id, UploadChunk.index],
+                set_={"sha256": stored.sha256, "created_at": func.now()},
+            )
+        )
+        await db.commit()
+        return {"index": index, "size": stored.size, "sha256": stored.sha256}
+
+    @staticmethod
+    async def complete(db: AsyncSession, session_id: str) -> FileModel:
+        """Assemble the chunks into a blob and create the file.
+
+        The session is marked completing in a short transaction, the blob is
+        assembled and hashed without a transaction open, and the file row
+        is added in another short one. Chunk uploads are refused from the
+        first step on. A call while another one is assembling gets a 409;
+        one after it finished gets the same file back.
+        """
+        result = await db.execute(
+            select(UploadSession)
+            .where(UploadSession.id == session_id)
+            .with_for_update()
+        )
+        session = result.scalars().first()
+        if session is None:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session.status == COMPLETED:
+            file = await FileService.get_file(db, session.file_id)
+            if not file:
+                raise HTTPException(status_code=404, detail="File not found")
+            return file
+        if session.status == COMPLETING:
+            raise HTTPException(
+                status_code=409, detail="Upload session is already being completed"
+            )
+        if session.expires_at <= datetime.now(timezone.utc):
+            raise HTTPException(status_code=404, detail="Upload session expired")
+
+        result = await db.execute(
+            select(UploadChunk.index).where(UploadChunk.session_id == session_id)
+        )
+        missing = sorted(set(range(session.chunk_count)) - set(result.scalars()))
+        if missing:
+            listed = ", ".join(str(index) for index in missing[:20])
+            raise HTTPException(status_code=409, detail=f"Missing chunks: {listed}")
+
+        session.status = COMPLETING
+        # Keeps the garbage collector away while the blob is assembled
+        session.expires_at = _expires_at()
+        await db.commit()
+
+        def store():
+            return blob_store.put_stream(
+                _read_chunks(session_id, session.chunk_count),
+                max_size=session.size,
+                expected_sha256=session.sha256,
+            )
+
+        try:
+            blob = await store()
+            new_file = await FileService.add_stored_file(
+                db,
+                session.folder_id,
+                session.filename[: -len(".pdf")],
+                blob,
+                store,
+            )
+            await db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session_id)
+                .values(status=COMPLETED, file_id=new_file.id)
+            )
+            await db.execute(
+                delete(UploadChunk).where(UploadChunk.session_id == session_id)
+            )
+            await db.commit()
+        except BaseException:
+            # Hand the session back, so chunks can be re-sent and it retried
+            await db.rollback()
+            await db.execute(
+                update(UploadSession)
+                .where(
+                    UploadSession.id == session_id,
+                    UploadSession.status == COMPLETING,
+                )
+                .values(status=ACTIVE)
+            )
+            await db.commit()
+            raise
+
+        await _remove_session_dir(session_id)
+        return new_file
+
+    @staticmethod
+    async def abort(db: AsyncSession, session_id: str) -> bool:
+        result = await db.execute(
+            delete(UploadSession)
+            .where(UploadSession.id == session_id, UploadSession.status == ACTIVE)
+            .returning(UploadSession.id)
+        )
+        deleted = result.scalar_one_or_none() is not None
+        await db.commit()
+        if deleted:
+            await _remove_session_dir(session_id)
+        return deleted
+
+    @staticmethod
+    async def collect_garbage(db: AsyncSession) -> int:
+        """Drop expired sessions together with their chunks."""
+        result = await db.execute(
+            delete(UploadSession)
+            .where(UploadSession.expires_at < func.now())
+            .returning(UploadSession.id)
+        )
+        session_ids = result.scalars().all()
+        await db.commit()
+        for session_id in session_ids:
+            await _remove_session_dir(session_id)
+        return len(session_ids)
+
+    @staticmethod
+    async def _get_session(
+        db: AsyncSession, session_id: str, active: bool = False
+    ) -> UploadSession:
+        result = await db.execute(
+            select(UploadSession).where(UploadSession.id == session_id)
+        )
+        session = result.scalars().first()
+        if session is None or (
+            session.status == ACTIVE
+            and session.expires_at <= datetime.now(timezone.utc)
+        ):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if active and session.status == COMPLETING:
+            raise HTTPException(
+                status_code=409, detail="Upload session is being completed"
+            )
+        if active and session.status != ACTIVE:
+            raise HTTPException(
+                status_code=409, detail="Upload session is already completed"
+            )
+        return session
+
+
+def _describe(session: UploadSession, chunks: List) -> dict:
+    sizes = {index: size for index, size in chunks}
+    offset = 0
+    while offset // session.chunk_size in sizes and offset < session.size:
+        offset += sizes[offset // session.chunk_size]
+    return {
+        "id": session.id,
+        "folder_id": session.folder_id,
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": session.chunk_count,
+        "status": session.status,
+        "received": sorted(sizes),
+        "offset": session.size if session.status == COMPLETED else offset,
+        "file_id": session.file_id,
+        "expires_at": session.expires_at,
+    }
+
+
+async def collect_expired_uploads() -> int:
+    async with AsyncSessionLocal() as db:
+        return await UploadService.collect_garbage(db)
+
+
+upload_gc = PeriodicTask(collect_expired_uploads, settings.UPLOAD_GC_INTERVAL)
@@ -0,0 +1,188 @@
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    Text,
+    cast,
+    func,
+    insert,
+    literal,
+    literal_column,
+    true,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.core.notifications import pending_notifications
+from src.models.change import ChangeLog
+from src.models.folder import Folder
+from src.models.version import VersionCounter
+
+# The version_counters row holding the newest version pruned from the log
+TREE_SCOPE = "tree"
+CHANGE_CHANNEL = "change_feed"
+
+
+def _as_bigint(xid):
+    return cast(cast(xid, Text), BigInteger)
+
+
+def settled(version):
+    """True for versions of transactions that can no longer commit.
+
+    A version is the id of the writing transaction. Ids below the snapshot's
+    xmin belong to transactions that have all finished, so no change with a
+    version up to there can still show up.
+    """
+    return version < _as_bigint(func.pg_snapshot_xmin(func.pg_current_snapshot()))
+
+
+class VersionService:
+
+    @staticmethod
+    async def bump(
+        db: AsyncSession,
+        folder_ids: Iterable[Optional[int]] = (),
+        changes: Iterable[dict] = (),
+    ) -> int:
+        """Record a mutation in the current transaction.
+
+        Bumps the file-listing version of every folder in ``folder_ids`` and
+        appends ``changes`` to the change log under the transaction id, which
+        is the new tree version. Every mutation needs at least one change to
+        move the tree version. Nothing is shared between writers here, so
+        they only wait on each other for the folder rows. Notifications
+        queued on ``db`` so far are sent along.
+        """
+        folder_ids = sorted({i for i in folder_ids if i is not None})
+        changes = list(changes)
+        version = _as_bigint(func.pg_current_xact_id())
+
+        # One round-trip for the whole bookkeeping
+        statement = select(version)
+        if folder_ids:
+            bumped = (
+                update(Folder)
+                .where(Folder.id.in_(folder_ids))
+                .values(version=Folder.version + 1, updated_at=Folder.updated_at)
+                .returning(Folder.id)
+                .cte("bumped")
+            )
+            statement = statement.add_cte(bumped)
+        if changes:
+            entries = (
+                func.unnest(
+                    literal([c["entity"] for c in changes], ARRAY(Text)),
+                    literal([c["action"] for c in changes], ARRAY(Text)),
+                    literal([c["entity_id"] for c in changes], ARRAY(Integer)),
+                    literal([json.dumps(c["data"]) for c in changes], ARRAY(Text)),
+                )
+                .table_valued("entity", "action", "entity_id", "data")
+                .render_derived()
+            )
+            logged = (
+                insert(ChangeLog)
+                .from_select(
+                    ["version", "entity", "action", "entity_id", "data"],
+                    select(
+                        version,
+                        entries.c.entity,
+                        entries.c.action,
+                        entries.c.entity_id,
+                        cast(entries.c.data, JSONB),
+                    ),
+                )
+                .returning(ChangeLog.id)
+                .cte("logged")
+            )
+            # Delivered on commit; listeners read the new rows from the log
+            statement = statement.add_cte(logged).add_columns(
+                func.pg_notify(CHANGE_CHANNEL, cast(version, Text))
+            )
+        notified = pending_notifications(db.info)
+        if notified is not None:
+            statement = statement.add_columns(notified)
+        result = await db.execute(statement)
+        return result.scalar_one()
+
+    @staticmethod
+    async def settled_version(db: AsyncSession) -> int:
+        """The newest settled version, where the change feed reads up to.
+
+        Transactions don't commit in id order, so a newer version that is
+        already visible waits until every older writer has finished.
+        """
+        result = await db.execute(select(_newest_settled().subquery().c.version))
+        return result.scalar_one()
+
+    @staticmethod
+    async def tree_version(db: AsyncSession) -> tuple[str, datetime]:
+        """A token for the tree as this snapshot sees it, and when it changed.
+
+        The newest settled version alone stays put while an older writer is
+        open, so the newer changes already visible are counted in as well.
+        For the same settled version those only ever grow, so their count
+        and newest version tell the snapshots apart. Read it in the same
+        snapshot as the data it labels.
+        """
+        newest = _newest_settled().cte("newest")
+        recent = (
+            select(
+                func.count().label("count"),
+                func.max(ChangeLog.version).label("version"),
+                func.max(ChangeLog.created_at).label("created_at"),
+            )
+            .where(ChangeLog.version > select(newest.c.version).scalar_subquery())
+            .subquery()
+        )
+        result = await db.execute(
+            select(
+                newest.c.version,
+                newest.c.created_at,
+                recent.c.count,
+                recent.c.version.label("recent_version"),
+                recent.c.created_at.label("recent_created_at"),
+            ).join_from(newest, recent, true())
+        )
+        row = result.one()
+        if not row.count:
+            return str(row.version), row.created_at
+        token = f"{row.version}.{row.recent_version}.{row.count}"
+        return token, max(row.created_at, row.recent_created_at)
+
+    @staticmethod
+    async def pruned_version(db: AsyncSession) -> int:
+        """The newest version no longer in the change log."""
+        result = await db.execute(
+            select(VersionCounter.value).where(VersionCounter.scope == TREE_SCOPE)
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def folder_version(db: AsyncSession, folder_id: int) -> Optional[int]:
+        result = await db.execute(select(Folder.version).where(Folder.id == folder_id))
+        return result.scalar_one_or_none()
+
+
+def _newest_settled():
+    logged = (
+        select(ChangeLog.version, ChangeLog.created_at)
+        .where(settled(ChangeLog.version))
+        .order_by(ChangeLog.version.desc())
+        .limit(1)
+        .subquery()
+    )
+    # Past the newest logged version once the log has been pruned
+    pruned = select(VersionCounter.value, VersionCounter.updated_at).where(
+        VersionCounter.scope == TREE_SCOPE
+    )
+    return (
+        union_all(select(logged), pruned)
+        .order_by(literal_column("version").desc())
+        .limit(1)
+    )
@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.notifications import PgListener
+from src.models.job import Job
+from src.services.job import NOTIFY_CHANNEL, JobService
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncSession, Job], Awaitable[None]]
+
+
+class JobWorker:
+    """Runs queued jobs inside the API process, off the request path.
+
+    ``concurrency`` jobs run at once on the event loop; CPU-bound work is
+    handed to a process pool through ``run_cpu`` so it never blocks requests.
+    A handler's writes are committed together with the job's completion.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        concurrency: int,
+        processes: int,
+        poll_interval: float,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self._handlers: dict[str, JobHandler] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def attach(self, listener: PgListener) -> None:
+        listener.subscribe(NOTIFY_CHANNEL, self.wake)
+        # Jobs enqueued while the connection was down sent no notification
+        listener.on_reconnect(self.wake)
+
+    def wake(self, payload: Optional[str] = None) -> None:
+        self._wakeup.set()
+
+    async def run_cpu(self, fn: Callable, *args):
+        if self._executor is None:
+            raise RuntimeError("Job worker is not running")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def start(self) -> None:
+        if self._tasks or not self._handlers:
+            return
+        # Fresh interpreters instead of forks of the running event loop
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._tasks = [
+            asyncio.create_task(self._run()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                ran = await self._run_one()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                ran = False
+            if ran:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                await self._expire_leases()
+            self._wakeup.clear()
+
+    async def _run_one(self) -> bool:
+        async with self.session_factory() as db:
+            job = await JobService.claim(db, self._handlers)
+        if job is None:
+            return False
+
+        try:
+            async with self.session_factory() as db:
+                await self._handlers[job.kind](db, job)
+                await JobService.complete(db, job.id)
+                await db.commit()
+        except asyncio.CancelledError:
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            async with self.session_factory() as db:
+                await JobService.fail(db, job, f"{type(exc).__name__}: {exc}")
+        return True
+
+    async def _release(self, job: Job) -> None:
+        async with self.session_factory() as db:
+            await JobService.release(db, job.id)
+
+    async def _expire_leases(self) -> None:
+        try:
+            async with self.session_factory() as db:
+                await JobService.expire_leases(db)
+        except Exception:
+            logger.exception("Could not expire job leases")
+
+
+job_worker = JobWorker(
+    AsyncSessionLocal,
+    concurrency=settings.JOB_CONCURRENCY,
+    processes=settings.JOB_PROCESSES,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+)
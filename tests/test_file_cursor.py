@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+from src.core.pagination import encode_cursor
+from src.services.file import _decode_file_cursor
+
+UPDATED_AT = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+class FileCursorTest(unittest.TestCase):
+    def assertInvalid(self, cursor: str):
+        with self.assertRaises(HTTPException) as raised:
+            _decode_file_cursor(cursor)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(raised.exception.detail, "Invalid cursor")
+
+    def test_round_trip(self):
+        cursor = encode_cursor(["updated_at", "desc", UPDATED_AT, 42])
+        self.assertEqual(
+            _decode_file_cursor(cursor), ["updated_at", "desc", UPDATED_AT, 42]
+        )
+        cursor = encode_cursor(["name", "asc", "Report", 7])
+        self.assertEqual(_decode_file_cursor(cursor), ["name", "asc", "Report", 7])
+
+    def test_undecodable(self):
+        self.assertInvalid("not a cursor!")
+        self.assertInvalid(encode_cursor(["name", "asc", "Report"]))
+
+    def test_tampered(self):
+        for values in [
+            [["name"], "asc", "Report", 7],
+            ["size", "asc", "Report", 7],
+            ["name", "up", "Report", 7],
+            ["name", "asc", None, 7],
+            ["updated_at", "asc", 1760788800, 7],
+            ["updated_at", "asc", "yesterday", 7],
+            ["updated_at", "asc", "2026-10-18T12:00:00", 7],
+            ["name", "asc", "Report", "7"],
+            ["name", "asc", "Report", 7.5],
+            ["name", "asc", "Report", True],
+            ["name", "asc", "Report", 2**31],
+        ]:
+            with self.subTest(values=values):
+                self.assertInvalid(encode_cursor(values))
+
+
+if __name__ == "__main__":
+    unittest.main()
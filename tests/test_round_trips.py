@@ -0,0 +1,133 @@
+"""Statements sent to PostgreSQL per mutation.
+
+Counted by the request timing hooks and read back from the Server-Timing
+header, so BEGIN and COMMIT are not included. Needs DATABASE_URL to point
+at a migrated test database; skipped when it can't be reached.
+
+    python -m unittest tests.test_round_trips
+"""
+
+import re
+import unittest
+import uuid
+
+import httpx
+from sqlalchemy import text
+
+from src.core.config import settings
+from src.core.database import engine
+from src.main import app
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# Ceilings per request; a new statement on one of these paths has to raise
+# its budget here on purpose. Counts say nothing about contention: every
+# mutation that changes folder stats, moves included, updates the root row
+# of its tree, so writes in one tree queue on it from that UPDATE until
+# they commit. Moves lock only the moved folders and the target before.
+BUDGETS = {
+    "create file": 3,
+    "rename file": 3,
+    "move file": 3,
+    "rename folder": 3,
+    "move folder": 5,
+    "upload": 5,
+    "delete file": 6,
+}
+
+
+class RoundTripTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        if not settings.SERVER_TIMING_ENABLED:
+            self.skipTest("SERVER_TIMING_ENABLED is off")
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        except Exception as error:
+            await engine.dispose()
+            self.skipTest(f"No test database: {error}")
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        )
+        self.root_id = None
+
+    async def asyncTearDown(self):
+        if self.root_id is not None:
+            await self.client.delete(f"/api/v1/folders/{self.root_id}")
+        await self.client.aclose()
+        # Pooled connections belong to this test's event loop
+        await engine.dispose()
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> dict:
+        response = await self.client.request(method, url, **kwargs)
+        self.assertEqual(response.status_code, 200, f"{label}: {response.text}")
+        queries = int(QUERIES.search(response.headers["server-timing"]).group(1))
+        self.assertLessEqual(queries, BUDGETS[label], label)
+        return response.json()
+
+    async def create_folder(self, name: str, parent_id=None) -> dict:
+        response = await self.client.post(
+            "/api/v1/folders/", json={"name": name, "parent_id": parent_id}
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    async def test_file_mutations(self):
+        root = await self.create_folder(f"Round trips {uuid.uuid4().hex[:8]}")
+        self.root_id = root["id"]
+        other = await self.create_folder("Other", root["id"])
+
+        file = await self.request(
+            "create file",
+            "POST",
+            "/api/v1/files/",
+            json={"name": "Report", "extension": "pdf", "folder_id": root["id"]},
+        )
+        await self.request(
+            "rename file", "PUT", f"/api/v1/files/{file['id']}", json={"name": "Q1"}
+        )
+        await self.request(
+            "move file",
+            "PUT",
+            f"/api/v1/files/{file['id']}",
+            json={"folder_id": other["id"]},
+        )
+        await self.request("delete file", "DELETE", f"/api/v1/files/{file['id']}")
+
+    async def test_upload(self):
+        root = await self.create_folder(f"Round trips {uuid.uuid4().hex[:8]}")
+        self.root_id = root["id"]
+        # Unique content, so deleting it also releases its blob
+        content = b"%PDF-1.4\n% " + uuid.uuid4().hex.encode() + b"\n%%EOF\n"
+
+        file = await self.request(
+            "upload",
+            "POST",
+            "/api/v1/files/upload/",
+            data={"folder_id": str(root["id"])},
+            files={"uploaded_file": ("Scan.pdf", content, "application/pdf")},
+        )
+        await self.request("delete file", "DELETE", f"/api/v1/files/{file['id']}")
+
+    async def test_folder_mutations(self):
+        root = await self.create_folder(f"Round trips {uuid.uuid4().hex[:8]}")
+        self.root_id = root["id"]
+        target = await self.create_folder("Target", root["id"])
+        folder = await self.create_folder("Contracts", root["id"])
+
+        await self.request(
+            "rename folder",
+            "PUT",
+            f"/api/v1/folders/{folder['id']}",
+            json={"name": "Agreements"},
+        )
+        await self.request(
+            "move folder",
+            "POST",
+            f"/api/v1/folders/{folder['id']}/move",
+            json={"parent_id": target["id"]},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()